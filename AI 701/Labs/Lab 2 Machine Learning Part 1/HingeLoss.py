@@ -1,4 +1,8 @@
+import zlib
+from array import array
+
 import numpy as np
+from scipy.sparse import csr_matrix
 from sklearn.datasets import load_iris
 from sklearn.model_selection import ShuffleSplit, train_test_split
 
@@ -19,24 +23,59 @@ def dict_extractor(filepath):
     return rv_dict
 
 
-def feature_extractor(filepath, fea_dict):
-    nfeas = len(fea_dict)
-    data = np.empty([0, nfeas])
-    target = np.empty([0, 1])
-    fb = open(filepath, 'r')
-    line = fb.readline()
+def bag_of_words(filepath, fea_dict=None, n_features=None):
+    # One pass over the labelled lines of filepath, returning the CSR arrays
+    # (indptr, indices, data) of their word counts, the targets, the dictionary
+    # and the number of columns. Words missing from fea_dict are skipped, and
+    # without fea_dict new words get the next column as in dict_extractor. With
+    # n_features, words are hashed into that many columns and no dictionary is used.
+    grow = fea_dict is None and n_features is None
+    if grow:
+        fea_dict = {}
+    indptr = array('q', [0])
+    indices = array('i')
+    data = array('i')
+    target = array('i')
+    with open(filepath, 'r') as fb:
+        for line in fb:
+            words = line.split()
+            if not words:
+                continue
+            target.append(int(words[0]))
+            counts = {}
+            for w in words[1:]:
+                if n_features is not None:
+                    column = zlib.crc32(w.encode('utf-8')) % n_features
+                elif w in fea_dict:
+                    column = fea_dict[w]
+                elif grow:
+                    column = fea_dict[w] = len(fea_dict)
+                else:
+                    continue
+                counts[column] = counts.get(column, 0) + 1
+            columns = sorted(counts)
+            indices.extend(columns)
+            data.extend(counts[column] for column in columns)
+            indptr.append(len(indices))
+
+    nfeas = n_features if n_features is not None else len(fea_dict)
+    return (np.frombuffer(indptr, dtype=np.int64), np.frombuffer(indices, dtype=np.int32),
+            np.frombuffer(data, dtype=np.int32), np.frombuffer(target, dtype=np.int32),
+            fea_dict, nfeas)
+
+
+def sparse_feature_extractor(filepath, fea_dict=None, n_features=None):
+    # feature_extractor as a scipy CSR matrix, never building the dense one
+    indptr, indices, data, target, fea_dict, nfeas = bag_of_words(filepath, fea_dict, n_features)
+    data = csr_matrix((data.astype(float), indices, indptr), shape=(len(target), nfeas))
+    return data, target.reshape(len(target), 1).astype(float), fea_dict
 
-    while line:
-        tmp = np.zeros([1, nfeas])
-        words = line.split()
-        target = np.append(target, int(words[0]))
-        for w in words[1:]:
-            tmp[0, fea_dict[w]] += 1
-        data = np.append(data, tmp, axis=0)
-        line = fb.readline()
 
-    fb.close()
-    target = np.array(target).reshape(len(target), 1)
+def feature_extractor(filepath, fea_dict):
+    indptr, indices, counts, target, _, nfeas = bag_of_words(filepath, fea_dict)
+    data = np.zeros([len(target), nfeas])
+    data[np.repeat(np.arange(len(target)), np.diff(indptr)), indices] = counts
+    target = target.reshape(len(target), 1).astype(float)
 
     return data, target
 
@@ -72,8 +111,8 @@ def feature_extractor(filepath, fea_dict):
 
 
 def test_hingloss(Xtest, Ytest, mu, sigma, w):
-    x = (Xtest - mu) / sigma
-    yp = np.dot(Xtest, w)
+    # Xtest may be a dense array or a scipy sparse matrix
+    yp = Xtest @ w
     yp[yp > 0] = 1
     yp[yp < 0] = -1
     acc = sum(yp == Ytest) / len(Ytest)
@@ -83,14 +122,13 @@ def test_hingloss(Xtest, Ytest, mu, sigma, w):
 
 
 def main_sent():
-    dict_train = dict_extractor(r"./review_train.txt")
-    xtrain, ytrain = feature_extractor(r"./review_train.txt", dict_train)
+    xtrain, ytrain, dict_train = sparse_feature_extractor(r"./review_train.txt")
     print(xtrain)
     print(ytrain)
     print(dict_train)
 
     loss, w, mu, sigma = LinearSVM_SGD(xtrain, ytrain, 10)
-    xtest, ytest = feature_extractor(r"./review_test.txt", dict_train)
+    xtest, ytest, _ = sparse_feature_extractor(r"./review_test.txt", dict_train)
     acc = test_hingloss(xtest, ytest.reshape(len(ytest)), mu, sigma, w)
 
 
@@ -2,8 +2,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 
-def sigmoid(x):
-    return 1 / (1 + np.exp(-x))
+def sigmoid(x, out=None):
+    # Same as 1 / (1 + e^-x), but tanh saturates where e^-x would overflow
+    if out is None:
+        return 0.5 * (1 + np.tanh(0.5 * x))
+    np.multiply(x, 0.5, out=out)
+    np.tanh(out, out=out)
+    out += 1
+    out *= 0.5
+    return out
     # Creating the Feed forward neural network
     # 1 Input layer(1, 30)
     # 1 hidden layer (1, 5)
@@ -21,10 +28,12 @@ def f_forward(x, w1, w2):
 # initializing the weights randomly
 
 def generate_wt(x, y):
-    l = []
-    for i in range(x * y):
-        l.append(np.random.randn())
-    return np.array(l).reshape(x, y)
+    return np.random.randn(x, y)
+
+
+def generate_weights(sizes):
+    # one weight matrix between each pair of consecutive layer sizes
+    return [generate_wt(x, y) for x, y in zip(sizes[:-1], sizes[1:])]
     # for loss we will be using mean square error(MSE)
 
 
@@ -36,51 +45,161 @@ def loss(out, Y):
 
 
 def back_prop(x, y, w1, w2, alpha):
-    z1 = x.dot(w1)  # input from layer 1
-    a1 = sigmoid(z1)  # output of layer 2 # Output layer
-    z2 = a1.dot(w2)  # input of out layer
-    a2 = sigmoid(z2)  # output of out layer # error in output layer
-    d2 = (a2 - y)
-    d1 = np.multiply((w2.dot((d2.transpose()))).transpose(), (np.multiply(a1, 1 - a1)))  # Gradient for w1 and w2
-    w1_adj = x.transpose().dot(d1)
-    w2_adj = a1.transpose().dot(d2)
+    w1_adj, w2_adj = backward(forward(x, [w1, w2]), y, [w1, w2])  # Gradient for w1 and w2
     w1 = w1 - (alpha * (w1_adj))
     w2 = w2 - (alpha * (w2_adj))
     return (w1, w2)
 
 
-def train(x, Y, w1, w2, alpha=0.01, epoch=10):
+def forward(x, weights):
+    # activations of every layer for a [batch, features] input, starting with x
+    activations = [x]
+    for w in weights:
+        activations.append(sigmoid(activations[-1].dot(w)))
+    return activations
+
+
+def backward(activations, y, weights):
+    # gradients of every weight matrix, reusing the activations of forward
+    gradients = [None] * len(weights)
+    d = activations[-1] - y  # error in output layer
+    for l in reversed(range(len(weights))):
+        gradients[l] = activations[l].transpose().dot(d)
+        if l > 0:
+            d = np.multiply(d.dot(weights[l].transpose()), np.multiply(activations[l], 1 - activations[l]))
+    return gradients
+
+
+def make_workspace(sizes, batch_size, dtype=np.float32):
+    # preallocated buffers for train_step: the activations of every layer, the
+    # targets, the error and sigmoid derivative of every layer after the input
+    # and the gradient of every weight matrix
+    return {
+        'activations': [np.empty((batch_size, n), dtype=dtype) for n in sizes],
+        'targets': np.empty((batch_size, sizes[-1]), dtype=dtype),
+        'deltas': [np.empty((batch_size, n), dtype=dtype) for n in sizes[1:]],
+        'derivatives': [np.empty((batch_size, n), dtype=dtype) for n in sizes[1:-1]],
+        'gradients': [np.empty((x, y), dtype=dtype) for x, y in zip(sizes[:-1], sizes[1:])],
+    }
+
+
+def workspace_rows(workspace, n):
+    # views of the first n rows of the batch buffers of workspace
+    rows = dict(workspace)
+    for key in ('activations', 'deltas', 'derivatives'):
+        rows[key] = [buffer[:n] for buffer in workspace[key]]
+    rows['targets'] = workspace['targets'][:n]
+    return rows
+
+
+def train_step(workspace, weights, alpha):
+    # one forward and backward pass over the batch in workspace['activations'][0]
+    # and workspace['targets'], writing every intermediate into the workspace and
+    # updating the weights in place, so nothing is allocated; returns the summed
+    # squared error of the batch before the update
+    a = workspace['activations']
+    d = workspace['deltas']
+    s = workspace['derivatives']
+    g = workspace['gradients']
+    for l, w in enumerate(weights):
+        np.matmul(a[l], w, out=a[l + 1])
+        sigmoid(a[l + 1], out=a[l + 1])
+    np.subtract(a[-1], workspace['targets'], out=d[-1])  # error in output layer
+    error = np.einsum('ij,ij->', d[-1], d[-1])
+    for l in reversed(range(len(weights))):
+        np.matmul(a[l].T, d[l], out=g[l])
+        if l > 0:
+            np.matmul(d[l], weights[l].T, out=d[l - 1])
+            np.subtract(1, a[l], out=s[l - 1])
+            np.multiply(s[l - 1], a[l], out=s[l - 1])
+            np.multiply(d[l - 1], s[l - 1], out=d[l - 1])
+    for w, gradient in zip(weights, g):
+        gradient *= alpha / len(a[0])
+        np.subtract(w, gradient, out=w)
+    return error
+
+
+def train_batched(x, Y, weights, alpha=0.01, epoch=10, batch_size=32, shuffle=True, seed=None,
+                  dtype=np.float64):
+    # mini-batch training of a network with any number of layers: one forward
+    # and one backward pass per batch of rows of x, stepping by the mean gradient.
+    # The batches go through buffers allocated once (see train_step), and
+    # dtype=np.float32 halves the memory traffic of small networks
+    x = np.asarray(x, dtype=dtype).reshape(len(x), -1)
+    Y = np.asarray(Y, dtype=dtype).reshape(len(Y), -1)
+    weights = [np.array(w, dtype=dtype) for w in weights]
+    sizes = [x.shape[1]] + [w.shape[1] for w in weights]
+    batch_size = min(batch_size, len(x))
+    full = make_workspace(sizes, batch_size, dtype)
+    last = workspace_rows(full, len(x) % batch_size)
+    rng = np.random.default_rng(seed)
     acc = []
     losss = []
     for j in range(epoch):
-        l = []
-        for i in range(len(x)):
-            out = f_forward(x[i], w1, w2)
-            l.append((loss(out, Y[i])))
-            w1, w2 = back_prop(x[i], Y[i], w1, w2, alpha)
+        order = rng.permutation(len(x)) if shuffle else None
+        total = 0.0
+        for start in range(0, len(x), batch_size):
+            stop = min(start + batch_size, len(x))
+            workspace = full if stop - start == batch_size else last
+            if order is None:
+                workspace['activations'][0][...] = x[start:stop]
+                workspace['targets'][...] = Y[start:stop]
+            else:
+                np.take(x, order[start:stop], axis=0, out=workspace['activations'][0], mode='clip')
+                np.take(Y, order[start:stop], axis=0, out=workspace['targets'], mode='clip')
+            total += train_step(workspace, weights, alpha)
+        total /= sizes[-1] * len(x)
         if (j + 1) % 50 == 0:
-            print("epochs:", j + 1, "======== acc:", (1 - (sum(l) / len(x))) * 100)
-        acc.append((1 - (sum(l) / len(x))) * 100)
-        losss.append(sum(l) / len(x))
+            print("epochs:", j + 1, "======== acc:", (1 - total) * 100)
+        acc.append((1 - total) * 100)
+        losss.append(total)
+    return acc, losss, weights
+
+
+def train(x, Y, w1, w2, alpha=0.01, epoch=10):
+    # one sample at a time, in order
+    acc, losss, (w1, w2) = train_batched(x, Y, [w1, w2], alpha, epoch, batch_size=1, shuffle=False)
     return acc, losss, w1, w2
 
 
-def predict(x, w1, w2):
-    Out = f_forward(x, w1, w2)
-    maxm = 0
-    k = 0
-    for i in range(len(Out[0])):
-        if maxm < Out[0][i]:
-            maxm = Out[0][i]
-            k = i
-    if k == 0:
-        print("Image is of letter A.")
-    elif k == 1:
-        print("Image is of letter B.")
-    else:
-        print("Image is of letter C.")
-    plt.imshow(x.reshape(5, 6))
-    plt.show()
+# names of the output classes, in order
+LABELS = ['A', 'B', 'C']
+
+
+def predict_proba(x, weights):
+    # output layer activations for every row of x, an [n, features] array
+    a = np.asarray(x).reshape(-1, weights[0].shape[0])
+    for w in weights:
+        a = sigmoid(a.dot(w))
+    return a
+
+
+def predict(x, weights, labels=LABELS):
+    # label of the largest output for every row of x; labels is a sequence or a
+    # dict from output index to label
+    if isinstance(labels, dict):
+        labels = [labels[i] for i in range(len(labels))]
+    return np.asarray(labels)[np.argmax(predict_proba(x, weights), axis=1)]
+
+
+def save_model(path, weights, labels=LABELS):
+    # weights as w1, w2, ... and the labels in a compressed .npz file
+    arrays = {'w%d' % (i + 1): w for i, w in enumerate(weights)}
+    if labels is not None:
+        if isinstance(labels, dict):
+            labels = [labels[i] for i in range(len(labels))]
+        arrays['labels'] = np.asarray(labels)
+    np.savez_compressed(path, **arrays)
+
+
+def load_model(path):
+    # weights and labels (None if not saved) written by save_model
+    with np.load(path) as data:
+        weights = []
+        while 'w%d' % (len(weights) + 1) in data.files:
+            weights.append(data['w%d' % (len(weights) + 1)])
+        labels = data['labels'].tolist() if 'labels' in data.files else None
+    return weights, labels
 
 
 def main_nn():
@@ -120,7 +239,8 @@ def main_nn():
 
     # Step 8 inference
     print(r"inference letter ")
-    predict(x[0], w1, w2)
+    print("Image is of letter %s." % predict(x[0], [w1, w2])[0])
+    plt.imshow(x[0].reshape(5, 6))
     plt.show()
 
 
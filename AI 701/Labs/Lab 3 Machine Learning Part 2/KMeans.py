@@ -1,23 +1,450 @@
+import mmap
+import multiprocessing
+import os
+
 import numpy as np
 from matplotlib import pyplot as plt
 
 
+# Largest chunk × k block of distances computed at once
+CHUNK_ELEMENTS = 1 << 22
+
+
+def float_type(points):
+    """returns the floating point type to compute with for points"""
+    dtype = np.asarray(points[:0]).dtype
+    return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
+
+
+def chunk_rows(k, chunk_size=None):
+    """returns how many points to compare with k centroids at once"""
+    if chunk_size is not None:
+        return chunk_size
+    return max(1, CHUNK_ELEMENTS // max(k, 1))
+
+
 def initialize_centroids(points, k):
     """returns k centroids from the initial points"""
-    centroids = points.copy()
-    np.random.shuffle(centroids)
-    return centroids[:k]
+    return np.array(points[np.sort(np.random.choice(len(points), k, replace=False))])
+
 
+def kmeans_plus_plus(points, k, seed=None):
+    """returns k centroids chosen from the points by greedy k-means++ seeding"""
+    rng = np.random.default_rng(seed)
+    n = len(points)
+    trials = 2 + int(np.log(k))
+    centroids = np.empty((k, points.shape[1]), dtype=float_type(points))
+    centroids[0] = points[rng.integers(n)]
+    _, distances = closest_centroid(points, centroids[:1], return_distances=True)
+    for i in range(1, k):
+        # Sample candidates with probability proportional to their squared
+        # distance from the closest centroid so far, and keep the one that
+        # lowers the total squared distance the most
+        cumulative = np.cumsum(distances, dtype=np.float64)
+        if cumulative[-1] > 0:
+            candidates = np.searchsorted(cumulative, rng.random(trials) * cumulative[-1], side='right')
+            candidates = np.minimum(candidates, n - 1)
+        else:
+            candidates = rng.integers(n, size=1)
+        best = None
+        for index in candidates:
+            _, new_distances = closest_centroid(points, points[index:index + 1], return_distances=True)
+            np.minimum(distances, new_distances, out=new_distances)
+            total = new_distances.sum(dtype=np.float64)
+            if best is None or total < best[0]:
+                best = (total, index, new_distances)
+        _, index, distances = best
+        centroids[i] = points[index]
+    return centroids
 
-def closest_centroid(points, centroids):
-    """returns an array containing the index to the nearest centroid for each point"""
-    distances = np.sqrt(((points - centroids[:, np.newaxis]) ** 2).sum(axis=2))
-    return np.argmin(distances, axis=0)
+
+def centroid_scores(chunk, centroids, centroid_norms):
+    """returns the squared distances from the points of chunk to the centroids, less |x|²"""
+    # |x - c|² = |x|² - 2x·c + |c|², and |x|² is the same for every centroid
+    scores = chunk @ centroids.T
+    scores *= -2
+    scores += centroid_norms
+    return scores
+
+
+def closest_centroid(points, centroids, chunk_size=None, return_distances=False):
+    """returns an array containing the index to the nearest centroid for each point,
+    and the squared distances to them if return_distances is set"""
+    dtype = float_type(points)
+    centroids = np.asarray(centroids, dtype=dtype)
+    n = len(points)
+    closest = np.empty(n, dtype=np.intp)
+    distances = np.empty(n, dtype=dtype) if return_distances else None
+
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    rows = chunk_rows(len(centroids), chunk_size)
+    for start in range(0, n, rows):
+        chunk = np.asarray(points[start:start + rows], dtype=dtype)
+        scores = centroid_scores(chunk, centroids, centroid_norms)
+        nearest = np.argmin(scores, axis=1)
+        closest[start:start + len(chunk)] = nearest
+        if return_distances:
+            best = scores[np.arange(len(chunk)), nearest] + np.einsum('ij,ij->i', chunk, chunk)
+            distances[start:start + len(chunk)] = np.maximum(best, 0)
+    if return_distances:
+        return closest, distances
+    return closest
+
+
+def centroid_sums(points, closest, k):
+    """returns the sum and the number of the points closest to each centroid"""
+    counts = np.bincount(closest, minlength=k)
+    sums = np.zeros((k, points.shape[1]), dtype=float_type(points))
+    np.add.at(sums, closest, points)
+    return sums, counts
 
 
 def move_centroids(points, closest, centroids):
-    """returns the new centroids assigned from the points closest to them"""
-    return np.array([points[closest == k].mean(axis=0) for k in range(centroids.shape[0])])
+    """returns the new centroids assigned from the points closest to them,
+    leaving centroids without points where they are"""
+    sums, counts = centroid_sums(points, closest, centroids.shape[0])
+    moved = np.array(centroids, dtype=sums.dtype)
+    assigned = counts > 0
+    moved[assigned] = sums[assigned] / counts[assigned, np.newaxis]
+    return moved
+
+
+def assigned_distances(points, centroids, closest, chunk_size=None):
+    """returns the squared distance from each point to the centroid it is assigned to"""
+    dtype = float_type(points)
+    distances = np.empty(len(points), dtype=dtype)
+    rows = chunk_rows(len(centroids), chunk_size)
+    for start in range(0, len(points), rows):
+        chunk = np.asarray(points[start:start + rows], dtype=dtype)
+        difference = chunk - centroids[closest[start:start + len(chunk)]]
+        distances[start:start + len(chunk)] = np.einsum('ij,ij->i', difference, difference)
+    return distances
+
+
+def centroid_bounds(points, centroids, algorithm='hamerly', chunk_size=None):
+    """returns the index to the nearest centroid for each point, the distance to it
+    and the lower bounds on the distances to the others that the 'hamerly' and
+    'elkan' algorithms keep across iterations
+
+    Hamerly keeps one lower bound per point, the distance to the second closest
+    centroid. Elkan keeps one per point and centroid, which skips more distance
+    computations but takes n × k memory.
+    """
+    dtype = float_type(points)
+    centroids = np.asarray(centroids, dtype=dtype)
+    n, k = len(points), len(centroids)
+    closest = np.empty(n, dtype=np.intp)
+    upper = np.empty(n)
+    lower = np.empty((n, k) if algorithm == 'elkan' else n)
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    rows = chunk_rows(k, chunk_size)
+    for start in range(0, n, rows):
+        chunk = np.asarray(points[start:start + rows], dtype=dtype)
+        stop = start + len(chunk)
+        scores = centroid_scores(chunk, centroids, centroid_norms)
+        closest[start:stop] = np.argmin(scores, axis=1)
+        distances = np.sqrt(np.maximum(scores + np.einsum('ij,ij->i', chunk, chunk)[:, np.newaxis], 0))
+        upper[start:stop] = distances[np.arange(len(chunk)), closest[start:stop]]
+        if algorithm == 'elkan':
+            lower[start:stop] = distances
+        elif k > 1:
+            lower[start:stop] = np.partition(distances, 1, axis=1)[:, 1]
+        else:
+            lower[start:stop] = np.inf
+    return closest, upper, lower
+
+
+def bounded_closest_centroid(points, centroids, previous, closest, upper, lower, chunk_size=None):
+    """updates the index to the nearest centroid for each point and its bounds from
+    centroid_bounds in place after the centroids moved from previous, and returns
+    how many points changed cluster
+
+    The bounds move by how far the centroids moved. By the triangle inequality
+    a point cannot have changed cluster while its distance to its centroid is
+    below half the distance from that centroid to the nearest other one, or
+    below its lower bounds, so only the remaining points are compared with
+    every centroid, the same way closest_centroid does.
+    """
+    dtype = float_type(points)
+    centroids = np.asarray(centroids, dtype=dtype)
+    k = len(centroids)
+    elkan = lower.ndim == 2
+    shift = np.sqrt(((centroids - previous) ** 2).sum(axis=1))
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    between = np.sqrt(np.maximum(centroid_norms[:, np.newaxis] + centroid_norms
+                                 - 2 * (centroids @ centroids.T), 0))
+    np.fill_diagonal(between, np.inf)
+    between *= 0.5
+    half_nearest = between.min(axis=1)
+
+    upper += shift[closest]
+    if elkan:
+        lower -= shift
+    elif k > 1:
+        # Other centroids came at most the largest shift of any of them closer
+        largest, second = np.argsort(shift)[::-1][:2]
+        lower -= np.where(closest == largest, shift[second], shift[largest])
+
+    changed = 0
+    rows = chunk_rows(k, chunk_size)
+    for start in range(0, len(points), rows):
+        assigned = closest[start:start + rows]
+        bound_upper = upper[start:start + rows]
+        bound_lower = lower[start:start + rows]
+        if elkan:
+            # Only points not already ruled out by the nearest other centroid
+            # are compared with the bound for every centroid
+            check = np.flatnonzero(bound_upper >= half_nearest[assigned])
+            bound = np.maximum(bound_lower[check], between[assigned[check]])
+            bound[np.arange(len(check)), assigned[check]] = np.inf
+            still = (bound_upper[check, np.newaxis] >= bound).any(axis=1)
+            check, bound = check[still], bound[still]
+        else:
+            bound = np.maximum(bound_lower, half_nearest[assigned])
+            check = np.flatnonzero(bound_upper >= bound)
+        if not len(check):
+            continue
+
+        # Tighten the upper bound to the distance itself before comparing again
+        chunk = np.asarray(points[start + check], dtype=dtype)
+        difference = chunk - centroids[assigned[check]]
+        bound_upper[check] = np.sqrt(np.einsum('ij,ij->i', difference, difference))
+        if elkan:
+            still = (bound_upper[check, np.newaxis] >= bound).any(axis=1)
+        else:
+            still = bound_upper[check] >= bound[check]
+        check, chunk = check[still], chunk[still]
+        if not len(check):
+            continue
+
+        scores = centroid_scores(chunk, centroids, centroid_norms)
+        nearest = np.argmin(scores, axis=1)
+        distances = np.sqrt(np.maximum(scores + np.einsum('ij,ij->i', chunk, chunk)[:, np.newaxis], 0))
+        changed += np.count_nonzero(nearest != assigned[check])
+        assigned[check] = nearest
+        bound_upper[check] = distances[np.arange(len(check)), nearest]
+        if elkan:
+            bound_lower[check] = distances
+        else:
+            bound_lower[check] = np.partition(distances, 1, axis=1)[:, 1]
+    return changed
+
+
+def kmeans(points, k, init='k-means++', max_iter=300, tol=1e-8, chunk_size=None, seed=None,
+           algorithm='lloyd'):
+    """returns the centroids, the index to the nearest centroid for each point and
+    the number of iterations run
+
+    Stops once no point changes cluster or no centroid moves more than tol
+    (squared distance). init is 'k-means++', 'random' or an array of centroids.
+    A cluster left without points is moved to the point farthest from its centroid.
+    algorithm 'hamerly' or 'elkan' skips the distance computations the
+    triangle inequality rules out (see bounded_closest_centroid), giving the
+    same result as 'lloyd' but much faster for large k once few points move.
+    """
+    if algorithm not in ('lloyd', 'hamerly', 'elkan'):
+        raise ValueError('unknown algorithm %r' % algorithm)
+    rng = np.random.default_rng(seed)
+    if isinstance(init, str) and init == 'k-means++':
+        centroids = kmeans_plus_plus(points, k, rng)
+    elif isinstance(init, str) and init == 'random':
+        centroids = np.array(points[np.sort(rng.choice(len(points), k, replace=False))],
+                             dtype=float_type(points))
+    else:
+        centroids = np.array(init, dtype=float_type(points))
+
+    if algorithm == 'lloyd':
+        closest = closest_centroid(points, centroids, chunk_size)
+    else:
+        closest, upper, lower = centroid_bounds(points, centroids, algorithm, chunk_size)
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        sums, counts = centroid_sums(points, closest, k)
+        moved = centroids.copy()
+        assigned = counts > 0
+        moved[assigned] = sums[assigned] / counts[assigned, np.newaxis]
+        empty = np.flatnonzero(~assigned)
+        if len(empty):
+            distances = assigned_distances(points, centroids, closest, chunk_size)
+            farthest = np.argpartition(distances, -len(empty))[-len(empty):]
+            moved[empty] = points[farthest]
+        shift = ((moved - centroids) ** 2).sum(axis=1).max()
+        previous, centroids = centroids, moved
+
+        if algorithm == 'lloyd':
+            new_closest = closest_centroid(points, centroids, chunk_size)
+            changed = not np.array_equal(new_closest, closest)
+            closest = new_closest
+        else:
+            changed = bounded_closest_centroid(points, centroids, previous, closest, upper, lower,
+                                               chunk_size) > 0
+        if not changed or shift <= tol:
+            break
+    return centroids, closest, iteration
+
+
+def minibatch_update(batch, centroids, counts):
+    """moves the centroids towards the points of batch in place and returns the
+    index to the nearest centroid for each of them
+
+    counts holds how many points each centroid has been moved towards, so every
+    centroid stays the running mean of its points. Call this on each batch of a
+    stream, starting from counts of zeros.
+    """
+    closest = closest_centroid(batch, centroids)
+    sums, batch_counts = centroid_sums(batch, closest, centroids.shape[0])
+    counts += batch_counts
+    assigned = batch_counts > 0
+    centroids[assigned] += ((sums[assigned] - batch_counts[assigned, np.newaxis] * centroids[assigned])
+                            / counts[assigned, np.newaxis])
+    return closest
+
+
+def minibatch_kmeans(points, k, batch_size=1024, max_iter=100, tol=0.0, chunk_size=None, seed=None):
+    """returns the centroids, the index to the nearest centroid for each point and
+    the number of batches used
+
+    Every iteration moves the centroids towards a random batch of points, and
+    stops early once no centroid moves more than tol (squared distance).
+    Centroids are seeded with k-means++ on a sample of 3 batches.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(points)
+    sample = np.sort(rng.choice(n, min(n, max(3 * batch_size, k)), replace=False))
+    centroids = kmeans_plus_plus(np.asarray(points[sample]), k, rng)
+    counts = np.zeros(k, dtype=np.int64)
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        batch = np.asarray(points[np.sort(rng.integers(0, n, min(batch_size, n)))])
+        previous = centroids.copy()
+        minibatch_update(batch, centroids, counts)
+        if ((centroids - previous) ** 2).sum(axis=1).max() <= tol:
+            break
+    return centroids, closest_centroid(points, centroids, chunk_size), iteration
+
+
+def open_parts(source):
+    """returns the arrays of points in source, memory-mapping .npy files
+
+    source is an array (such as an np.memmap), a path to a .npy file or a list
+    of either for points split across several files.
+    """
+    if isinstance(source, (str, os.PathLike, np.ndarray)):
+        source = [source]
+    return [np.load(part, mmap_mode='r') if isinstance(part, (str, os.PathLike)) else part
+            for part in source]
+
+
+def part_descriptor(part):
+    """returns what a worker process needs to map a memory-mapped array again"""
+    if not (isinstance(part, np.memmap) and isinstance(part.base, mmap.mmap)):
+        raise ValueError('a process pool needs the points in .npy files or np.memmap arrays')
+    order = 'F' if part.flags.f_contiguous and not part.flags.c_contiguous else 'C'
+    return part.filename, part.dtype.str, part.shape, part.offset, order
+
+
+def partial_sums(chunk, centroids):
+    """returns the sum and the number of the points of chunk closest to each
+    centroid, and the squared distance and the point farthest from its centroid"""
+    chunk = np.asarray(chunk, dtype=float_type(chunk))
+    closest, distances = closest_centroid(chunk, centroids, return_distances=True)
+    sums, counts = centroid_sums(chunk, closest, len(centroids))
+    farthest = np.argmax(distances)
+    return sums.astype(np.float64), counts, distances[farthest], chunk[farthest]
+
+
+# Memory-mapped parts of the points, in the worker processes
+_worker_parts = None
+
+
+def _init_worker_parts(descriptors):
+    global _worker_parts
+    _worker_parts = [np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape, order=order)
+                     for filename, dtype, shape, offset, order in descriptors]
+
+
+def _partial_sums_task(task):
+    index, start, stop, centroids = task
+    return partial_sums(_worker_parts[index][start:stop], centroids)
+
+
+def kmeans_out_of_core(source, k, init='k-means++', max_iter=100, tol=1e-8, chunk_size=65536,
+                       processes=None, init_size=None, seed=None):
+    """returns the centroids of points that do not fit in memory and the number
+    of iterations run
+
+    source is read with open_parts, chunk_size points at a time, so only one
+    chunk and the centroids are in memory: each chunk adds its per centroid
+    sums and counts to the totals the centroids are then moved to. With
+    processes set, the chunks are spread over a pool of that many processes
+    that map the files themselves. init is 'k-means++' or 'random', run on a
+    random sample of init_size points (by default 100 per centroid), or an
+    array of centroids. Stops once no centroid moves more than tol (squared
+    distance). The nearest centroid of each point can then be found with
+    closest_centroid, which reads memory-mapped points in chunks too.
+    """
+    parts = open_parts(source)
+    dtype = float_type(parts[0])
+    chunks = [(index, start, min(start + chunk_size, len(part)))
+              for index, part in enumerate(parts) for start in range(0, len(part), chunk_size)]
+    rng = np.random.default_rng(seed)
+
+    if isinstance(init, str):
+        # Sample rows in file order so memory-mapped reads stay sequential
+        n = sum(len(part) for part in parts)
+        size = min(n, init_size or 100 * k)
+        rows = np.sort(rng.choice(n, size, replace=False))
+        offsets = np.cumsum([0] + [len(part) for part in parts])
+        sample = np.concatenate([np.asarray(part[rows[(rows >= low) & (rows < high)] - low], dtype=dtype)
+                                 for part, low, high in zip(parts, offsets[:-1], offsets[1:])])
+        if init == 'k-means++':
+            centroids = kmeans_plus_plus(sample, k, rng)
+        else:
+            centroids = sample[np.sort(rng.choice(len(sample), k, replace=False))]
+    else:
+        centroids = np.array(init, dtype=dtype)
+
+    pool = None
+    if processes:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker_parts,
+                                    initargs=([part_descriptor(part) for part in parts],))
+    try:
+        iteration = 0
+        for iteration in range(1, max_iter + 1):
+            if pool is None:
+                results = (partial_sums(parts[index][start:stop], centroids)
+                           for index, start, stop in chunks)
+            else:
+                # imap keeps chunk order, so the sums add up the same on every run
+                results = pool.imap(_partial_sums_task,
+                                    [(index, start, stop, centroids) for index, start, stop in chunks])
+
+            sums = np.zeros(centroids.shape)
+            counts = np.zeros(k, dtype=np.int64)
+            farthest = []
+            for chunk_sums, chunk_counts, distance, point in results:
+                sums += chunk_sums
+                counts += chunk_counts
+                farthest.append((distance, point))
+
+            moved = centroids.copy()
+            assigned = counts > 0
+            moved[assigned] = sums[assigned] / counts[assigned, np.newaxis]
+            # Clusters left without points move to the farthest point of a chunk
+            empty = np.flatnonzero(~assigned)
+            farthest.sort(key=lambda item: -item[0])
+            for cluster, (_, point) in zip(empty, farthest):
+                moved[cluster] = point
+            shift = ((moved - centroids) ** 2).sum(axis=1).max()
+            centroids = moved
+            if shift <= tol:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return centroids, iteration
 
 
 def main_km():
@@ -29,16 +456,19 @@ def main_km():
     c = initialize_centroids(points, 3)
     print(r'initial center ', c)
     for i in range(50):
-        closest_centroid(points, c)
         c = move_centroids(points, closest_centroid(points, c), c)
         if (i+1) % 10 == 0:
             print("iteration %d" % (i+1))
             print(c)
 
+    c, closest, iterations = kmeans(points, 3)
+    print("k-means++ converged after %d iterations" % iterations)
+    print(c)
+
     plt.scatter(points[:, 0], points[:, 1])
     plt.scatter(c[:, 0], c[:, 1], marker='^')
     plt.show()
 
 
 if __name__ == '__main__':
-    main_km()
\ No newline at end of file
+    main_km()
@@ -1,8 +1,13 @@
 # Credits: Percy Liang & Dorsa Sadigh
 
 
+import collections
+import heapq
+import itertools
+import math
 import sys
 import util
+from array import array
 sys.setrecursionlimit(10000)
 
 ### Model (search problem)
@@ -23,6 +28,27 @@ class TransportationProblem(object):
         if state*2<=self.N:
             result.append(('tram', state*2, 2))
         return result
+    def endStates(self):
+        return [self.N]
+    def topologicalStates(self):
+        # Every action moves to a larger block, so successors come later
+        return range(1, self.N+1)
+    def predAndCost(self, state):
+        # return list of (action, prevState, cost) triples, the inverse of succAndCost
+        result = []
+        if state-1>=1:
+            result.append(('walk', state-1, 1))
+        if state%2==0 and state//2>=1:
+            result.append(('tram', state//2, 2))
+        return result
+
+def transportationHeuristic(problem):
+    # Every unit of cost at most doubles the block number (walking from 1
+    # or taking the tram), so at least log2(N/state) cost remains.
+    # The bound is consistent, so A* never needs to reopen a state.
+    def heuristic(state):
+        return math.ceil(math.log2(problem.N / state))
+    return heuristic
 
 ### Algorithms
 
@@ -90,23 +116,499 @@ def dynamicProgramming(problem):
 
     
 
-def uniformCostSearch(problem):
-    frontier = util.PriorityQueue()
-    frontier.update(problem.startState(), 0)
+def dynamicProgrammingIterative(problem, typecode='d'):
+    # Same answer as dynamicProgramming without recursion, for acyclic problems.
+    # States are processed so that every successor comes first: the reverse of
+    # problem.topologicalStates() if the problem has it, otherwise the
+    # post-order of an explicit-stack depth first search from the start.
+    # Only the future cost and the index of the best action are kept per
+    # state; when topologicalStates() is a range they are stored in flat
+    # arrays (costs with the given array typecode, e.g. 'i' for small
+    # integer costs) instead of dicts.
+    startState = problem.startState()
+    if hasattr(problem, 'topologicalStates'):
+        order = problem.topologicalStates()
+        order = order[::-1] if isinstance(order, range) else reversed(list(order))
+    else:
+        order = []
+        visited = {startState}
+        stack = [(startState, iter(problem.succAndCost(startState)))]
+        while stack:
+            state, successors = stack[-1]
+            for _, newState, _ in successors:
+                if newState not in visited:
+                    visited.add(newState)
+                    children = [] if problem.isEnd(newState) else problem.succAndCost(newState)
+                    stack.append((newState, iter(children)))
+                    break
+            else:
+                stack.pop()
+                order.append(state)
+
+    if isinstance(order, range):
+        first = min(order.start, order.stop - order.step)
+        size = len(order)
+        offset = lambda state: state - first
+        infinity = float('inf') if typecode in 'fd' else -1
+        costs = array(typecode, [infinity]) * size
+        actions = bytearray(size) # index of the best action + 1, 0 for none
+    else:
+        offset = lambda state: state
+        infinity = float('inf')
+        costs = {}
+        actions = {}
+
+    def futureCost(state):
+        cost = costs[offset(state)]
+        return float('inf') if cost == infinity else cost
+
+    for state in order:
+        if problem.isEnd(state):
+            costs[offset(state)] = 0
+            actions[offset(state)] = 0
+            continue
+        bestCost, bestAction = float('inf'), 0
+        for i, (action, newState, cost) in enumerate(problem.succAndCost(state)):
+            fCost = cost + futureCost(newState)
+            if fCost < bestCost:
+                bestCost, bestAction = fCost, i+1
+        costs[offset(state)] = infinity if bestCost == float('inf') else bestCost
+        actions[offset(state)] = bestAction
+
+    totalCost = futureCost(startState)
+    if totalCost == float('inf'):
+        return (totalCost, None)
+    history = []
+    state = startState
+    while not problem.isEnd(state):
+        action, newState, cost = problem.succAndCost(state)[actions[offset(state)]-1]
+        history.append((action, newState, cost))
+        state = newState
+    return (totalCost, history)
+
+def reconstructPath(parents, state):
+    # Follow parent pointers (state -> (prevState, action, cost)) back to
+    # the start and return the history from the start to state.
+    history = []
+    while parents[state] is not None:
+        prevState, action, cost = parents[state]
+        history.append((action, state, cost))
+        state = prevState
+    history.reverse()
+    return history
+
+def aStarSearch(problem, heuristic=lambda state: 0, tieBreak='deep', queue=util.PriorityQueue):
+    # heuristic(state) must never overestimate the cost to an end state and
+    # must be consistent (h(s) <= cost + h(s')), since states are never reopened:
+    # a state is only pushed when its pastCost strictly improves, which also
+    # holds for queues built with trackDone=False.
+    # Among states with equal pastCost+heuristic, tieBreak='deep' expands the
+    # one with the largest pastCost first, 'shallow' the smallest and None
+    # leaves it to the order of the states.
+    def priority(state, pastCost):
+        estimate = pastCost + heuristic(state)
+        if tieBreak == 'deep':
+            return (estimate, -pastCost)
+        if tieBreak == 'shallow':
+            return (estimate, pastCost)
+        return estimate
+
+    frontier = queue()
+    startState = problem.startState()
+    pastCosts = {startState: 0}
+    parents = {startState: None} # state -> (prevState, action, cost)
+    frontier.update(startState, priority(startState, 0))
+    while True:
+        state, _ = frontier.removeMin()
+        if state is None:
+            return (float('inf'), None)
+        pastCost = pastCosts[state]
+        if problem.isEnd(state):
+            return (pastCost, reconstructPath(parents, state))
+        for action, newState, cost in problem.succAndCost(state):
+            if frontier.isDone(newState):
+                continue
+            newPastCost = pastCost+cost
+            if newPastCost < pastCosts.get(newState, float('inf')):
+                pastCosts[newState] = newPastCost
+                parents[newState] = (state, action, cost)
+                frontier.update(newState, priority(newState, newPastCost))
+
+def bidirectionalSearch(problem, queue=util.PriorityQueue):
+    # Uniform cost search from the start and, through predAndCost, backwards
+    # from every state in endStates(), alternating between the two.
+    # Stops once the last costs removed from each side add up to the best
+    # meeting cost found, which then can no longer improve.
+    frontiers = [queue(), queue()]
+    pastCosts = [{}, {}]
+    parents = [{}, {}] # state -> (neighbour, action, cost) on each side
+    expand = [problem.succAndCost, problem.predAndCost]
+    for side, states in enumerate([[problem.startState()], problem.endStates()]):
+        for state in states:
+            pastCosts[side][state] = 0
+            parents[side][state] = None
+            frontiers[side].update(state, 0)
+
+    best = {'cost': float('inf'), 'state': None}
+    if problem.startState() in pastCosts[1]:
+        best = {'cost': 0, 'state': problem.startState()}
+    lastCosts = [0, 0]
+    side = 0
+    while True:
+        state, pastCost = frontiers[side].removeMin()
+        if state is None:
+            break
+        lastCosts[side] = pastCost
+        if lastCosts[0]+lastCosts[1] >= best['cost']:
+            break
+        other = 1-side
+        for action, newState, cost in expand[side](state):
+            if frontiers[side].isDone(newState):
+                continue
+            newPastCost = pastCost+cost
+            if newPastCost < pastCosts[side].get(newState, float('inf')):
+                pastCosts[side][newState] = newPastCost
+                parents[side][newState] = (state, action, cost)
+                frontiers[side].update(newState, newPastCost)
+                if newState in pastCosts[other]:
+                    totalCost = newPastCost+pastCosts[other][newState]
+                    if totalCost < best['cost']:
+                        best['cost'] = totalCost
+                        best['state'] = newState
+        side = other
+
+    state = best['state']
+    if state is None:
+        return (float('inf'), None)
+    history = reconstructPath(parents[0], state)
+    while parents[1][state] is not None:
+        nextState, action, cost = parents[1][state]
+        history.append((action, nextState, cost))
+        state = nextState
+    return (best['cost'], history)
+
+def uniformCostSearch(problem, queue=util.PriorityQueue):
+    # queue can be any of the priority queues in util, e.g.
+    # util.RadixPriorityQueue when all costs are small integers. A state is
+    # only pushed again when its cost strictly improves, so explored states,
+    # whose costs are final, are never reopened even by a queue built with
+    # trackDone=False; pastCosts and parents still keep every state reached.
+    frontier = queue()
+    startState = problem.startState()
+    pastCosts = {startState: 0}
+    parents = {startState: None} # state -> (prevState, action, cost)
+    frontier.update(startState, 0)
     while True:
         # Move from frontier to explored
         state, pastCost = frontier.removeMin()
+        if state is None:
+            return (float('inf'), None)
         if problem.isEnd(state):
-            return (pastCost, [])
-        # Push out on the frontier
+            return (pastCost, reconstructPath(parents, state))
+        # Push out on the frontier, skipping states already explored
         for action, newState, cost in problem.succAndCost(state):
-            frontier.update(newState, pastCost+cost)
+            if frontier.isDone(newState):
+                continue
+            newPastCost = pastCost+cost
+            if newPastCost < pastCosts.get(newState, float('inf')):
+                pastCosts[newState] = newPastCost
+                parents[newState] = (state, action, cost)
+                frontier.update(newState, newPastCost)
+
+def batchedUniformCostSearch(problem, batchSize=16, executor=None, queue=util.IndexedPriorityQueue):
+    # Uniform cost search for problems where succAndCost is expensive.
+    # Up to |batchSize| of the cheapest frontier states are removed at once and
+    # their successors computed together: by problem.succAndCostBatch(states)
+    # if the problem has it, else through executor.map (e.g. a
+    # concurrent.futures thread or process pool), else one by one. The batch
+    # is then committed in order exactly as uniformCostSearch would, so a
+    # state whose cost could still be undercut by the frontier or by a later
+    # member of the batch goes back on the frontier, keeping its successors.
+    # |queue| must accept trackDone=False, support peekMin and accept priorities
+    # below ones already removed, which rules out util.RadixPriorityQueue.
+    def expand(states):
+        if hasattr(problem, 'succAndCostBatch'):
+            return problem.succAndCostBatch(states)
+        if executor is not None:
+            return list(executor.map(problem.succAndCost, states))
+        return [problem.succAndCost(state) for state in states]
+
+    frontier = queue(trackDone=False)
+    startState = problem.startState()
+    pastCosts = {startState: 0}
+    parents = {startState: None} # state -> (prevState, action, cost)
+    explored = set()
+    successors = {} # state -> succAndCost(state) for states not yet committed
+    frontier.update(startState, 0)
+    while True:
+        batch = []
+        while len(batch) < batchSize:
+            state, _ = frontier.removeMin()
+            if state is None:
+                break
+            if state not in explored:
+                batch.append(state)
+        if not batch:
+            return (float('inf'), None)
+
+        pending = [state for state in batch
+                   if state not in successors and not problem.isEnd(state)]
+        for state, result in zip(pending, expand(pending)):
+            successors[state] = result
+
+        for i, state in enumerate(batch):
+            if state in explored:
+                continue
+            pastCost = pastCosts[state]
+            # Commit only if nothing left could still reach a cheaper cost
+            _, frontierMin = frontier.peekMin()
+            batchMin = min([pastCosts[other] for other in batch[i+1:]] or [float('inf')])
+            if (frontierMin is not None and frontierMin < pastCost) or batchMin < pastCost:
+                for other in batch[i:]:
+                    if other not in explored:
+                        frontier.update(other, pastCosts[other])
+                break
+            explored.add(state)
+            if problem.isEnd(state):
+                return (pastCost, reconstructPath(parents, state))
+            for action, newState, cost in successors.pop(state):
+                if newState in explored:
+                    continue
+                if pastCost+cost < pastCosts.get(newState, float('inf')):
+                    pastCosts[newState] = pastCost+cost
+                    parents[newState] = (state, action, cost)
+                    frontier.update(newState, pastCost+cost)
+
+def rememberCost(table, state, pastCost, maxNodes):
+    # Record pastCost for state in an LRU transposition table of at most
+    # maxNodes entries. Return False if state was already reached more cheaply.
+    oldCost = table.get(state)
+    if oldCost is not None:
+        table.move_to_end(state)
+        if oldCost <= pastCost:
+            return False
+    table[state] = pastCost
+    if len(table) > maxNodes:
+        table.popitem(last=False)
+    return True
+
+def idaStarSearch(problem, heuristic=lambda state: 0, maxNodes=100000):
+    # Iterative deepening A*: depth first searches bounded by
+    # pastCost+heuristic, raising the bound to the smallest value that
+    # exceeded it until an end state is found. Memory is the current path
+    # plus a transposition table of at most maxNodes states, evicted least
+    # recently used first, which skips states already reached as cheaply in
+    # the same iteration. heuristic must not overestimate.
+    startState = problem.startState()
+    if problem.isEnd(startState):
+        return (0, [])
+    bound = heuristic(startState)
+    while bound < float('inf'):
+        nextBound = float('inf')
+        table = collections.OrderedDict()
+        rememberCost(table, startState, 0, maxNodes)
+        path = [startState]
+        onPath = {startState}
+        pastCosts = [0]
+        history = []
+        stack = [iter(problem.succAndCost(startState))]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                onPath.remove(path.pop())
+                pastCosts.pop()
+                if history:
+                    history.pop()
+                continue
+            action, newState, cost = child
+            if newState in onPath:
+                continue
+            pastCost = pastCosts[-1]+cost
+            estimate = pastCost+heuristic(newState)
+            if estimate > bound:
+                nextBound = min(nextBound, estimate)
+                continue
+            if not rememberCost(table, newState, pastCost, maxNodes):
+                continue
+            history.append((action, newState, cost))
+            if problem.isEnd(newState):
+                return (pastCost, history)
+            path.append(newState)
+            onPath.add(newState)
+            pastCosts.append(pastCost)
+            stack.append(iter(problem.succAndCost(newState)))
+        bound = nextBound
+    return (float('inf'), None)
+
+def smaStarSearch(problem, heuristic=lambda state: 0, maxNodes=10000):
+    # Simplified memory-bounded A* (SMA*): A* that keeps at most maxNodes
+    # search nodes. When memory is full the shallowest leaf with the highest
+    # pastCost+heuristic is forgotten, and its parent remembers that value so
+    # the subtree is only regenerated once it is the most promising again.
+    # Successors are generated one at a time, and once all of a node's
+    # successors have been generated its value is backed up to the lowest of
+    # theirs. Successors already on the node's path are skipped, and a
+    # transposition table (LRU, maxNodes states) drops successors already
+    # reached more cheaply, or as cheaply and as shallow from elsewhere, so
+    # zero-cost cycles are never unrolled. Finds an optimal path if one fits
+    # in maxNodes nodes and heuristic does not overestimate.
+    infinity = float('inf')
+    nodes = {} # id -> node, for every node in memory
+    table = collections.OrderedDict() # state -> (pastCost, depth, (parent state, index))
+    openHeap = [] # (value, -depth, id) of nodes with successors to generate
+    leafHeap = [] # (-value, depth, id) of nodes without children in memory
+    ids = itertools.count()
+
+    def remember(state, pastCost, depth, source):
+        # Like rememberCost, but an equal cost only passes when it comes from
+        # the same source, i.e. a forgotten child generated again, or from a
+        # shallower node, whose path leaves more room under maxNodes.
+        old = table.get(state)
+        if old is not None:
+            table.move_to_end(state)
+            oldCost, oldDepth, oldSource = old
+            if oldCost < pastCost or (oldCost == pastCost and oldSource != source
+                                      and oldDepth <= depth):
+                return False
+        table[state] = (pastCost, depth, source)
+        if len(table) > maxNodes:
+            table.popitem(last=False)
+        return True
+
+    def onPath(node, state):
+        while node is not None:
+            if node['state'] == state:
+                return True
+            node = node['parent']
+        return False
+
+    def hasMore(node):
+        return (node['successors'] is None or node['next'] < len(node['successors'])
+                or len(node['forgotten']) > 0)
+
+    def touch(node):
+        # Push heap entries reflecting the node's current value.
+        if hasMore(node):
+            heapq.heappush(openHeap, (node['f'], -node['depth'], node['id']))
+        if not node['children'] and node['parent'] is not None:
+            heapq.heappush(leafHeap, (-node['f'], node['depth'], node['id']))
+
+    def addNode(state, pastCost, f, parent, action, cost, index):
+        node = {'id': next(ids), 'state': state, 'pastCost': pastCost, 'f': f,
+                'parent': parent, 'action': action, 'cost': cost, 'index': index,
+                'depth': 0 if parent is None else parent['depth']+1,
+                'successors': None, 'next': 0, 'forgotten': {}, 'children': set()}
+        nodes[node['id']] = node
+        if parent is not None:
+            parent['children'].add(node['id'])
+        touch(node)
+        return node
+
+    def backup(node):
+        # Once every successor has been generated, a node is worth the best
+        # of its children and forgotten children; propagate any increase up.
+        while (node is not None and node['successors'] is not None
+               and node['next'] == len(node['successors'])):
+            values = [nodes[child]['f'] for child in node['children']]
+            values.extend(node['forgotten'].values())
+            f = max(node['f'], min(values, default=infinity))
+            if f == node['f']:
+                return
+            node['f'] = f
+            touch(node)
+            node = node['parent']
+
+    def forget(keep):
+        # Remove the shallowest leaf with the highest value, other than keep.
+        skipped = []
+        while leafHeap:
+            entry = heapq.heappop(leafHeap)
+            negativeF, depth, nodeId = entry
+            node = nodes.get(nodeId)
+            if node is None or node['f'] != -negativeF or node['children']:
+                continue
+            if node is keep:
+                skipped.append(entry)
+                continue
+            parent = node['parent']
+            parent['children'].discard(nodeId)
+            parent['forgotten'][node['index']] = node['f']
+            del nodes[nodeId]
+            touch(parent)
+            break
+        for entry in skipped:
+            heapq.heappush(leafHeap, entry)
+
+    startState = problem.startState()
+    remember(startState, 0, 0, None)
+    root = addNode(startState, 0, heuristic(startState), None, None, None, None)
+    while True:
+        # Select the deepest node with the lowest value among those to expand
+        while openHeap:
+            f, negativeDepth, nodeId = openHeap[0]
+            node = nodes.get(nodeId)
+            if node is not None and node['f'] == f and hasMore(node):
+                break
+            heapq.heappop(openHeap)
+        if not openHeap or node['f'] == infinity:
+            return (infinity, None)
+        if problem.isEnd(node['state']):
+            history = []
+            while node['parent'] is not None:
+                history.append((node['action'], node['state'], node['cost']))
+                node = node['parent']
+            history.reverse()
+            return (nodes[nodeId]['pastCost'], history)
+
+        # Generate its next successor: a new one, else the best forgotten one
+        if node['successors'] is None:
+            node['successors'] = problem.succAndCost(node['state'])
+            if not node['successors']:
+                backup(node) # Dead end
+                continue
+        if node['next'] < len(node['successors']):
+            index = node['next']
+            node['next'] += 1
+            action, newState, cost = node['successors'][index]
+            pastCost = node['pastCost']+cost
+            if (onPath(node, newState)
+                    or not remember(newState, pastCost, node['depth']+1,
+                                    (node['state'], index))):
+                backup(node)
+                continue
+            if node['depth']+2 > maxNodes:
+                backup(node) # No room for a longer path
+                continue
+            f = max(node['f'], pastCost+heuristic(newState))
+        else:
+            index = min(node['forgotten'], key=node['forgotten'].get)
+            f = node['forgotten'].pop(index)
+            action, newState, cost = node['successors'][index]
+            pastCost = node['pastCost']+cost
+        child = addNode(newState, pastCost, f, node, action, cost, index)
+        backup(node)
+        while len(nodes) > maxNodes:
+            forget(child)
+        if len(openHeap) > 4*maxNodes or len(leafHeap) > 4*maxNodes:
+            openHeap[:] = []
+            leafHeap[:] = []
+            for other in nodes.values():
+                touch(other)
 
 ### Main
 
-problem = TransportationProblem(N=10000)
-# print(problem.succAndCost(3))
-# print(problem.succAndCost(9))
-#printSolution(backtrackingSearch(problem))
-printSolution(dynamicProgramming(problem))
-#printSolution(uniformCostSearch(problem))
+if __name__ == '__main__':
+    problem = TransportationProblem(N=10000)
+    # print(problem.succAndCost(3))
+    # print(problem.succAndCost(9))
+    #printSolution(backtrackingSearch(problem))
+    #printSolution(dynamicProgramming(problem))
+    printSolution(dynamicProgrammingIterative(problem, 'i'))
+    #printSolution(uniformCostSearch(problem))
+    #printSolution(uniformCostSearch(problem, util.RadixPriorityQueue))
+    #printSolution(aStarSearch(problem, transportationHeuristic(problem)))
+    #printSolution(bidirectionalSearch(problem))
+    #printSolution(batchedUniformCostSearch(problem, 64))
+    #printSolution(idaStarSearch(problem, transportationHeuristic(problem)))
+    #printSolution(smaStarSearch(problem, transportationHeuristic(problem), maxNodes=1000))
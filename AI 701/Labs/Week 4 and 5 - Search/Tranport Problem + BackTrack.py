@@ -2,6 +2,7 @@
 
 
 
+import math
 import sys
 import util
 sys.setrecursionlimit(10000)
@@ -25,6 +26,13 @@ class TransportationProblem(object):
             result.append(('tram', state*2, 2))
         return result
 
+def transportationLowerBound(problem):
+    # Every unit of cost at most doubles the block number, so at least
+    # log2(N/state) cost remains.
+    def lowerBound(state):
+        return math.ceil(math.log2(problem.N / state))
+    return lowerBound
+
 ### Algorithms
 
 # def printSolution(solution):
@@ -58,12 +66,52 @@ def backtrackingSearch(problem):
     recurse(problem.startState(), history=[], totalCost=0) # initial state
     return (best['cost'], best['history'])
 
+def branchAndBoundSearch(problem, lowerBound=lambda state: 0, memoize=False):
+    # Backtracking that abandons a state once totalCost plus a lower bound on
+    # its cost to go reaches the best cost so far. lowerBound(state) must
+    # never overestimate. The path is kept in one list that grows and shrinks
+    # as the search goes down and up, and is only copied on improvement.
+    # With memoize, after exploring a state the search remembers that its cost
+    # to go is at least best['cost'] minus the totalCost it was reached with
+    # (anything cheaper would have been found), and uses that as a bound.
+    best = {
+        'cost': float('+inf'),
+        'history': None
+    }
+    history = []
+    futureBound = {} # state -> lower bound on its cost to go
+    def bound(state):
+        return max(lowerBound(state), futureBound.get(state, 0))
+    def recurse(state, totalCost):
+        if problem.isEnd(state):
+            if totalCost<best['cost']:
+                best['cost'] = totalCost
+                best['history'] = list(history)
+            return
+        if totalCost+bound(state) >= best['cost']:
+            return
+        # Try the most promising children first to tighten the bound early
+        children = sorted(problem.succAndCost(state),
+                          key=lambda child: child[2]+bound(child[1]))
+        for action, newState, cost in children:
+            if totalCost+cost+bound(newState) >= best['cost']:
+                continue
+            history.append((action, newState, cost))
+            recurse(newState, totalCost+cost)
+            history.pop()
+        if memoize:
+            futureBound[state] = max(futureBound.get(state, 0), best['cost']-totalCost)
+
+    recurse(problem.startState(), totalCost=0)
+    return (best['cost'], best['history'])
+
 
 ### Main
 
-problem = TransportationProblem(N=6)
-#print(problem.succAndCost(116))
-#print(problem.succAndCost(9))
-#printSolution(backtrackingSearch(problem))
-backtrackingSearch(problem)
-
+if __name__ == '__main__':
+    problem = TransportationProblem(N=6)
+    #print(problem.succAndCost(116))
+    #print(problem.succAndCost(9))
+    #printSolution(backtrackingSearch(problem))
+    backtrackingSearch(problem)
+    #print(branchAndBoundSearch(problem, transportationLowerBound(problem), memoize=True))
@@ -0,0 +1,207 @@
+import argparse
+import importlib.util
+import json
+import os
+import time
+import tracemalloc
+
+import util
+
+
+def loadScript(filename):
+    # The algorithm scripts have spaces in their names, so load them by path.
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    name = os.path.splitext(filename)[0].replace(' ', '').replace('+', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+search = loadScript('DP + UCS.py')
+backtrack = loadScript('Tranport Problem + BackTrack.py')
+
+### Instrumentation
+
+class InstrumentedProblem(object):
+    # Wraps any problem with startState/isEnd/succAndCost, counting the
+    # successor calls and the distinct states they expanded. Other
+    # attributes (N, predAndCost, topologicalStates...) are passed through.
+    def __init__(self, problem):
+        self.problem = problem
+        self.succAndCostCalls = 0
+        self.expanded = set()
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+    def startState(self):
+        return self.problem.startState()
+    def isEnd(self, state):
+        return self.problem.isEnd(state)
+    def succAndCost(self, state):
+        self.succAndCostCalls += 1
+        self.expanded.add(state)
+        return self.problem.succAndCost(state)
+    def predAndCost(self, state):
+        self.succAndCostCalls += 1
+        self.expanded.add(('pred', state))
+        return self.problem.predAndCost(state)
+
+def instrumentedQueue(queueClass, stats):
+    # Returns a queue class that counts heap operations and the peak
+    # frontier size of every queue it creates into |stats|. Constructor
+    # arguments such as trackDone are passed on to |queueClass|.
+    class InstrumentedQueue(object):
+        def __init__(self, *args, **kwargs):
+            self.queue = queueClass(*args, **kwargs)
+        def update(self, state, newPriority):
+            stats['heapOps'] += 1
+            updated = self.queue.update(state, newPriority)
+            stats['frontierPeak'] = max(stats['frontierPeak'], len(self.queue))
+            return updated
+        def removeMin(self):
+            stats['heapOps'] += 1
+            return self.queue.removeMin()
+        def peekMin(self):
+            stats['heapOps'] += 1
+            return self.queue.peekMin()
+        def isDone(self, state):
+            return self.queue.isDone(state)
+    InstrumentedQueue.wrapped = queueClass
+    InstrumentedQueue.stats = stats
+    return InstrumentedQueue
+
+### Algorithms
+
+def aStar(problem, queue):
+    # The radix heap needs integer priorities, so no (estimate, pastCost)
+    # tie-breaking tuples there.
+    integer = getattr(queue, 'wrapped', queue) is util.RadixPriorityQueue
+    return search.aStarSearch(problem, search.transportationHeuristic(problem),
+                              None if integer else 'deep', queue)
+
+def batchedUcs(problem, queue):
+    # The batched search needs trackDone=False and priorities below ones
+    # already removed, which only util.IndexedPriorityQueue offers, so it
+    # always runs on that queue, instrumented if |queue| is.
+    if hasattr(queue, 'stats'):
+        queue = instrumentedQueue(util.IndexedPriorityQueue, queue.stats)
+    else:
+        queue = util.IndexedPriorityQueue
+    return search.batchedUniformCostSearch(problem, queue=queue)
+
+# name -> function(problem, queue class) returning (totalCost, history)
+ALGORITHMS = {
+    'backtracking': lambda problem, queue: backtrack.backtrackingSearch(problem),
+    'branchAndBound': lambda problem, queue: backtrack.branchAndBoundSearch(
+        problem, backtrack.transportationLowerBound(problem), memoize=True),
+    'dp': lambda problem, queue: search.dynamicProgramming(problem),
+    'dpIterative': lambda problem, queue: search.dynamicProgrammingIterative(problem, 'i'),
+    'ucs': lambda problem, queue: search.uniformCostSearch(problem, queue),
+    'batchedUcs': batchedUcs,
+    'astar': aStar,
+    'bidirectional': lambda problem, queue: search.bidirectionalSearch(problem, queue),
+    'idastar': lambda problem, queue: search.idaStarSearch(
+        problem, search.transportationHeuristic(problem), maxNodes=10000),
+    'smastar': lambda problem, queue: search.smaStarSearch(
+        problem, search.transportationHeuristic(problem), maxNodes=10000),
+}
+
+# Algorithms whose work grows exponentially with N
+EXPONENTIAL = {'backtracking'}
+
+QUEUES = {
+    'lazy': util.PriorityQueue,
+    'indexed': util.IndexedPriorityQueue,
+    'radix': util.RadixPriorityQueue,
+}
+
+def measure(algorithm, makeProblem, N, queueClass, memory):
+    # Runs |algorithm| three times: bare for wall time, instrumented for the
+    # counters, and under tracemalloc for the memory high-water mark, so the
+    # bookkeeping of one measurement does not distort the others.
+    result = {}
+    start = time.perf_counter()
+    totalCost, _ = ALGORITHMS[algorithm](makeProblem(N), queueClass)
+    result['time'] = time.perf_counter() - start
+    result['cost'] = totalCost
+
+    stats = {'heapOps': 0, 'frontierPeak': 0}
+    problem = InstrumentedProblem(makeProblem(N))
+    ALGORITHMS[algorithm](problem, instrumentedQueue(queueClass, stats))
+    result['expanded'] = len(problem.expanded)
+    result['succAndCostCalls'] = problem.succAndCostCalls
+    result['heapOps'] = stats['heapOps']
+    result['frontierPeak'] = stats['frontierPeak']
+
+    if memory:
+        tracemalloc.start()
+        ALGORITHMS[algorithm](makeProblem(N), queueClass)
+        result['peakBytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def run(algorithms, sizes, queue, limit, memory, maxExponentialN,
+        makeProblem=search.TransportationProblem):
+    # Sweeps every algorithm over the sizes. An algorithm that fails or takes
+    # longer than |limit| seconds is not run on the larger sizes, and
+    # exponential algorithms are not run past |maxExponentialN|.
+    results = []
+    stopped = set()
+    for N in sizes:
+        for algorithm in algorithms:
+            row = {'algorithm': algorithm, 'N': N, 'queue': queue}
+            if algorithm in stopped or (algorithm in EXPONENTIAL and N > maxExponentialN):
+                row['error'] = 'skipped'
+            else:
+                try:
+                    row.update(measure(algorithm, makeProblem, N, QUEUES[queue], memory))
+                    if row['time'] > limit:
+                        stopped.add(algorithm)
+                except RecursionError:
+                    row['error'] = 'recursion limit'
+                    stopped.add(algorithm)
+            results.append(row)
+        costs = set(row['cost'] for row in results if row['N'] == N and 'cost' in row)
+        for row in results:
+            if row['N'] == N:
+                row['agree'] = len(costs) <= 1
+    return results
+
+COLUMNS = ['algorithm', 'N', 'cost', 'expanded', 'succAndCostCalls', 'frontierPeak',
+           'heapOps', 'peakBytes', 'time']
+
+def table(results):
+    def cell(row, column):
+        if column not in row:
+            return row.get('error', '-') if column == 'cost' else '-'
+        if column == 'time':
+            return '{:.4f}'.format(row[column])
+        if column == 'cost' and not row['agree']:
+            return '{} MISMATCH'.format(row[column])
+        return str(row[column])
+    lines = [COLUMNS] + [[cell(row, column) for column in COLUMNS] for row in results]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(COLUMNS))]
+    return '\n'.join('  '.join(value.ljust(width) for value, width in zip(line, widths))
+                     for line in lines)
+
+### Main
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare search algorithms on TransportationProblem.')
+    parser.add_argument('--algorithms', nargs='+', choices=list(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 20, 100, 1000, 10000])
+    parser.add_argument('--queue', choices=list(QUEUES), default='lazy')
+    parser.add_argument('--limit', type=float, default=10.0,
+                        help='seconds after which an algorithm is not run on larger N')
+    parser.add_argument('--max-exponential-n', type=int, default=100,
+                        help='largest N for exponential algorithms such as backtracking')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the tracemalloc run')
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args()
+
+    results = run(args.algorithms, args.sizes, args.queue, args.limit, args.memory,
+                  args.max_exponential_n)
+    print(table(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
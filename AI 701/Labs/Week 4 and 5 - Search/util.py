@@ -7,6 +7,10 @@ class PriorityQueue:
         self.heap = []
         self.priorities = {}  # Map from state to priority
 
+    # Number of heap entries, including outdated ones.
+    def __len__(self):
+        return len(self.heap)
+
     # Insert |state| into the heap with priority |newPriority| if
     # |state| isn't in the heap or |newPriority| is smaller than the existing
     # priority.
@@ -28,3 +32,191 @@ class PriorityQueue:
             self.priorities[state] = self.DONE
             return (state, priority)
         return (None, None) # Nothing left...
+
+    # Returns (state with minimum priority, priority) without removing it
+    # or (None, None) if the priority queue is empty.
+    def peekMin(self):
+        while len(self.heap) > 0:
+            priority, state = self.heap[0]
+            if self.priorities[state] == self.DONE:
+                heapq.heappop(self.heap)  # Outdated priority, drop
+                continue
+            return (state, priority)
+        return (None, None)
+
+    # Return whether |state| has already been removed from the queue.
+    def isDone(self, state):
+        return self.priorities.get(state) == self.DONE
+
+# Binary heap with true decrease-key, for the same uses as PriorityQueue.
+# Each state has at most one entry, and |index| maps the states in the heap
+# to their positions, so memory is proportional to the frontier instead of
+# the number of updates. With trackDone=False removed states are forgotten
+# as well; update() may then insert a state again, so the caller must only
+# update a state when its cost strictly improves, as the searches in
+# DP + UCS.py do. Their own cost and parent maps still keep every state
+# reached, so this bounds the queue, not the whole search.
+class IndexedPriorityQueue:
+    def __init__(self, trackDone=True):
+        self.heap = []  # List of [priority, state]
+        self.index = {}  # Map from state to position in heap
+        self.done = set() if trackDone else None
+
+    def __len__(self):
+        return len(self.heap)
+
+    # Insert |state| into the heap with priority |newPriority| if
+    # |state| isn't in the heap or |newPriority| is smaller than the existing
+    # priority.
+    # Return whether the priority queue was updated.
+    def update(self, state, newPriority):
+        position = self.index.get(state)
+        if position is None:
+            if self.done is not None and state in self.done:
+                return False
+            self.heap.append([newPriority, state])
+            self.index[state] = len(self.heap) - 1
+            self._siftUp(len(self.heap) - 1)
+            return True
+        if newPriority < self.heap[position][0]:
+            self.heap[position][0] = newPriority
+            self._siftUp(position)
+            return True
+        return False
+
+    # Returns (state with minimum priority, priority)
+    # or (None, None) if the priority queue is empty.
+    def removeMin(self):
+        if not self.heap:
+            return (None, None)
+        priority, state = self.heap[0]
+        last = self.heap.pop()
+        del self.index[state]
+        if self.heap:
+            self.heap[0] = last
+            self.index[last[1]] = 0
+            self._siftDown(0)
+        if self.done is not None:
+            self.done.add(state)
+        return (state, priority)
+
+    # Returns (state with minimum priority, priority) without removing it
+    # or (None, None) if the priority queue is empty.
+    def peekMin(self):
+        if not self.heap:
+            return (None, None)
+        priority, state = self.heap[0]
+        return (state, priority)
+
+    # Return whether |state| has already been removed from the queue.
+    def isDone(self, state):
+        return self.done is not None and state in self.done
+
+    def _siftUp(self, position):
+        entry = self.heap[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if not entry[0] < self.heap[parent][0]:
+                break
+            self.heap[position] = self.heap[parent]
+            self.index[self.heap[position][1]] = position
+            position = parent
+        self.heap[position] = entry
+        self.index[entry[1]] = position
+
+    def _siftDown(self, position):
+        entry = self.heap[position]
+        size = len(self.heap)
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and self.heap[child + 1][0] < self.heap[child][0]:
+                child += 1
+            if not self.heap[child][0] < entry[0]:
+                break
+            self.heap[position] = self.heap[child]
+            self.index[self.heap[position][1]] = position
+            position = child
+        self.heap[position] = entry
+        self.index[entry[1]] = position
+
+# Radix heap for non-negative integer priorities that never drop below the
+# last priority removed, as in uniform cost search with integer costs.
+# Bucket i holds the states whose priority first differs from the last
+# removed priority at bit i-1, so removeMin only ever moves a state to a
+# lower bucket and decrease-key is a move between two dicts. trackDone=False
+# forgets removed states as in IndexedPriorityQueue.
+class RadixPriorityQueue:
+    def __init__(self, trackDone=True):
+        self.buckets = [{}]  # Each bucket maps state to priority
+        self.bucketOf = {}  # Map from state to its bucket
+        self.last = 0
+        self.done = set() if trackDone else None
+
+    def __len__(self):
+        return len(self.bucketOf)
+
+    def _bucket(self, priority):
+        return (priority ^ self.last).bit_length()
+
+    def _insert(self, state, priority):
+        bucket = self._bucket(priority)
+        while len(self.buckets) <= bucket:
+            self.buckets.append({})
+        self.buckets[bucket][state] = priority
+        self.bucketOf[state] = bucket
+
+    # Insert |state| into the heap with priority |newPriority| if
+    # |state| isn't in the heap or |newPriority| is smaller than the existing
+    # priority.
+    # Return whether the priority queue was updated.
+    def update(self, state, newPriority):
+        if newPriority < self.last:
+            raise ValueError('priority {} below last removed priority {}'.format(newPriority, self.last))
+        bucket = self.bucketOf.get(state)
+        if bucket is None:
+            if self.done is not None and state in self.done:
+                return False
+        elif newPriority < self.buckets[bucket][state]:
+            del self.buckets[bucket][state]
+        else:
+            return False
+        self._insert(state, newPriority)
+        return True
+
+    # Returns (state with minimum priority, priority)
+    # or (None, None) if the priority queue is empty.
+    def removeMin(self):
+        if not self.bucketOf:
+            return (None, None)
+        self._settle()
+        state, priority = self.buckets[0].popitem()
+        del self.bucketOf[state]
+        if self.done is not None:
+            self.done.add(state)
+        return (state, priority)
+
+    # Returns (state with minimum priority, priority) without removing it
+    # or (None, None) if the priority queue is empty.
+    def peekMin(self):
+        if not self.bucketOf:
+            return (None, None)
+        self._settle()
+        state = next(iter(self.buckets[0]))
+        return (state, self.buckets[0][state])
+
+    # Make bucket 0 hold the states with the minimum priority.
+    def _settle(self):
+        if not self.buckets[0]:
+            # Redistribute the first non-empty bucket around its minimum
+            bucket = next(i for i, entries in enumerate(self.buckets) if entries)
+            entries = self.buckets[bucket]
+            self.buckets[bucket] = {}
+            self.last = min(entries.values())
+            for state, priority in entries.items():
+                self._insert(state, priority)
+
+    # Return whether |state| has already been removed from the queue.
+    def isDone(self, state):
+        return self.done is not None and state in self.done
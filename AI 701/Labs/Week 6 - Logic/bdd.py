@@ -0,0 +1,240 @@
+from logic import *
+
+
+class BDD():
+    """Reduced ordered binary decision diagrams sharing one unique table.
+
+    Nodes are integers: 0 and 1 are the FALSE and TRUE terminals, and every
+    other node is a (level, low, high) triple testing the symbol at that
+    level of the order. The unique table guarantees each triple is built
+    once, so equal functions are equal nodes, and results of operations
+    are cached across calls. If max_nodes is given, building more nodes
+    than that raises MemoryError instead of growing without bound.
+    """
+
+    FALSE = 0
+    TRUE = 1
+
+    OPERATIONS = {
+        "and": lambda a, b: a and b,
+        "or": lambda a, b: a or b,
+        "implies": lambda a, b: (not a) or b,
+        "iff": lambda a, b: a == b,
+        "xor": lambda a, b: a != b,
+    }
+
+    def __init__(self, order=(), max_nodes=None):
+        self.max_nodes = max_nodes
+        self.order = []  # Symbol names by level
+        self.levels = {}  # Map from symbol name to level
+        self.nodes = [(None, None, None), (None, None, None)]
+        self.unique = {}  # Map from (level, low, high) to node
+        self.cache = {}  # Map from (operation, node, node) to node
+        for name in order:
+            self.level(name)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def level(self, name):
+        """Returns the level of a symbol, adding it below the others if new."""
+        if name not in self.levels:
+            self.levels[name] = len(self.order)
+            self.order.append(name)
+        return self.levels[name]
+
+    def level_of(self, node):
+        """Returns the level tested by node, or the number of levels for terminals."""
+        if node <= 1:
+            return len(self.order)
+        return self.nodes[node][0]
+
+    def node(self, level, low, high):
+        """Returns the node testing level with the given children."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        if key not in self.unique:
+            if self.max_nodes is not None and len(self) >= self.max_nodes:
+                raise MemoryError(f"BDD grew past {self.max_nodes} nodes")
+            self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self.unique[key]
+
+    def variable(self, name):
+        """Returns the node that is true exactly when symbol name is true."""
+        return self.node(self.level(name), BDD.FALSE, BDD.TRUE)
+
+    def apply(self, operation, u, v):
+        """Returns the node combining u and v with a named binary operation.
+
+        The diagrams are walked on an explicit stack, so their depth is not
+        bounded by the recursion limit.
+        """
+        result = self.shortcut(operation, u, v)
+        if result is not None:
+            return result
+
+        # Each frame is [key, level, pairs, results] for a pair split on the
+        # topmost symbol either operand tests: the node for key is built
+        # once results holds the nodes combining both pairs of cofactors
+        stack = [self.split(operation, u, v)]
+        while True:
+            key, level, pairs, results = stack[-1]
+            if len(results) < 2:
+                u, v = pairs[len(results)]
+                result = self.shortcut(operation, u, v)
+                if result is None:
+                    stack.append(self.split(operation, u, v))
+                else:
+                    results.append(result)
+                continue
+            stack.pop()
+            result = self.node(level, results[0], results[1])
+            self.cache[key] = result
+            if not stack:
+                return result
+            stack[-1][3].append(result)
+
+    def split(self, operation, u, v):
+        """Returns the apply frame splitting u and v on their topmost symbol."""
+        level = min(self.level_of(u), self.level_of(v))
+        u_low, u_high = self.children(u, level)
+        v_low, v_high = self.children(v, level)
+        return [(operation, u, v), level, ((u_low, v_low), (u_high, v_high)), []]
+
+    def shortcut(self, operation, u, v):
+        """Returns the result of an operation known without splitting, or None."""
+        if u <= 1 and v <= 1:
+            return int(BDD.OPERATIONS[operation](bool(u), bool(v)))
+        if operation == "and":
+            if u == BDD.FALSE or v == BDD.FALSE:
+                return BDD.FALSE
+            if u == BDD.TRUE or u == v:
+                return v
+            if v == BDD.TRUE:
+                return u
+        elif operation == "or":
+            if u == BDD.TRUE or v == BDD.TRUE:
+                return BDD.TRUE
+            if u == BDD.FALSE or u == v:
+                return v
+            if v == BDD.FALSE:
+                return u
+        return self.cache.get((operation, u, v))
+
+    def children(self, node, level):
+        """Returns the (low, high) cofactors of node with respect to level."""
+        if self.level_of(node) != level:
+            return node, node
+        _, low, high = self.nodes[node]
+        return low, high
+
+    def negate(self, u):
+        """Returns the node for the negation of u."""
+        return self.apply("xor", u, BDD.TRUE)
+
+    def compile(self, sentence):
+        """Returns the node equivalent to a logical sentence."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return self.negate(self.compile(sentence.operand))
+        if isinstance(sentence, And):
+            return self.combine("and", [self.compile(conjunct)
+                                        for conjunct in sentence.conjuncts],
+                                BDD.TRUE)
+        if isinstance(sentence, Or):
+            return self.combine("or", [self.compile(disjunct)
+                                       for disjunct in sentence.disjuncts],
+                                BDD.FALSE)
+        if isinstance(sentence, Implication):
+            return self.apply("implies", self.compile(sentence.antecedent),
+                              self.compile(sentence.consequent))
+        if isinstance(sentence, Biconditional):
+            return self.apply("iff", self.compile(sentence.left),
+                              self.compile(sentence.right))
+        raise TypeError("must be a logical sentence")
+
+    def combine(self, operation, nodes, empty):
+        """Returns nodes combined with an associative operation, or empty if none.
+
+        Neighbours are combined pairwise, round after round, so a long
+        conjunction such as a chain of implications does not rebuild an
+        ever larger diagram for every operand it adds.
+        """
+        while len(nodes) > 1:
+            nodes = [self.apply(operation, nodes[i], nodes[i + 1])
+                     if i + 1 < len(nodes) else nodes[i]
+                     for i in range(0, len(nodes), 2)]
+        return nodes[0] if nodes else empty
+
+    def count(self, u):
+        """Returns the number of assignments to all levels that satisfy u."""
+        # Nodes are built after their children, so one pass in order counts
+        # the assignments to the levels from each node's level down
+        below = [0, 1]
+        for level, low, high in self.nodes[2:u + 1]:
+            below.append(below[low] * 2 ** (self.level_of(low) - level - 1) +
+                         below[high] * 2 ** (self.level_of(high) - level - 1))
+        return below[u] * 2 ** self.level_of(u)
+
+
+class CompiledKnowledge():
+    """A knowledge base compiled once into a BDD for repeated queries.
+
+    Entailment and consistency checks and model counts then cost time
+    polynomial in the size of the diagrams instead of a full enumeration.
+    Symbols are ordered by first appearance in the knowledge base unless
+    an order is given, and max_nodes bounds the diagrams as in BDD.
+    """
+
+    def __init__(self, knowledge, order=None, max_nodes=None):
+        if order is None:
+            order = []
+            seen = set()
+            pending = [knowledge]
+            while pending:
+                sentence = pending.pop()
+                if isinstance(sentence, Symbol):
+                    if sentence.name not in seen:
+                        seen.add(sentence.name)
+                        order.append(sentence.name)
+                elif isinstance(sentence, Not):
+                    pending.append(sentence.operand)
+                elif isinstance(sentence, And):
+                    pending.extend(reversed(sentence.conjuncts))
+                elif isinstance(sentence, Or):
+                    pending.extend(reversed(sentence.disjuncts))
+                elif isinstance(sentence, Implication):
+                    pending.extend([sentence.consequent, sentence.antecedent])
+                elif isinstance(sentence, Biconditional):
+                    pending.extend([sentence.right, sentence.left])
+        self.knowledge = knowledge
+        self.symbols = knowledge.symbols()
+        self.bdd = BDD(order, max_nodes)
+        self.root = self.bdd.compile(knowledge)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.bdd.apply("implies", self.root,
+                              self.bdd.compile(query)) == BDD.TRUE
+
+    def consistent(self, query):
+        """Checks if query is true in some model of the knowledge base."""
+        return self.bdd.apply("and", self.root,
+                              self.bdd.compile(query)) != BDD.FALSE
+
+    def count_models(self, query=None):
+        """Returns the number of models of the knowledge base, and query if given.
+
+        Models are counted over the symbols of the knowledge base and query,
+        matching logic.count_models.
+        """
+        node = self.root
+        symbols = self.symbols
+        if query is not None:
+            node = self.bdd.apply("and", node, self.bdd.compile(query))
+            symbols = symbols | query.symbols()
+        unused = len(self.bdd.order) - len(symbols)
+        return self.bdd.count(node) // 2 ** unused
@@ -0,0 +1,221 @@
+import argparse
+import json
+import random
+import time
+
+from logic import *
+from bdd import CompiledKnowledge
+
+
+### Problems
+
+def houses(n):
+    """n people each in exactly one of n houses, one person per house (Puzzle.py)."""
+    knowledge = And()
+    for person in range(n):
+        knowledge.add(Or(*[Symbol(f"P{person}H{house}") for house in range(n)]))
+        for h1 in range(n):
+            for h2 in range(n):
+                if h1 != h2:
+                    knowledge.add(Implication(Symbol(f"P{person}H{h1}"),
+                                              Not(Symbol(f"P{person}H{h2}"))))
+    for house in range(n):
+        for p1 in range(n):
+            for p2 in range(n):
+                if p1 != p2:
+                    knowledge.add(Implication(Symbol(f"P{p1}H{house}"),
+                                              Not(Symbol(f"P{p2}H{house}"))))
+
+    # Pin the first person so the last house is entailed for the last person
+    # when n is at least two, and otherwise just ask about the only house
+    if n > 1:
+        knowledge.add(Symbol(f"P0H{n - 1}"))
+        query = Not(Symbol(f"P{n - 1}H{n - 1}"))
+    else:
+        query = Symbol("P0H0")
+    return knowledge, query
+
+
+def pigeonhole(n):
+    """n + 1 pigeons in n holes, which is unsatisfiable, so everything is entailed."""
+    knowledge = And()
+    for pigeon in range(n + 1):
+        knowledge.add(Or(*[Symbol(f"P{pigeon}H{hole}") for hole in range(n)]))
+    for hole in range(n):
+        for p1 in range(n + 1):
+            for p2 in range(p1 + 1, n + 1):
+                knowledge.add(Or(Not(Symbol(f"P{p1}H{hole}")),
+                                 Not(Symbol(f"P{p2}H{hole}"))))
+    return knowledge, Symbol("P0H0")
+
+
+def queens(n):
+    """One queen in every row of an n × n board, no two attacking."""
+    def square(row, column):
+        return Symbol(f"Q{row}_{column}")
+
+    knowledge = And()
+    for row in range(n):
+        knowledge.add(Or(*[square(row, column) for column in range(n)]))
+    for r1 in range(n):
+        for c1 in range(n):
+            for r2 in range(r1, n):
+                for c2 in range(n):
+                    if (r2, c2) <= (r1, c1):
+                        continue
+                    if r1 == r2 or c1 == c2 or abs(r1 - r2) == abs(c1 - c2):
+                        knowledge.add(Or(Not(square(r1, c1)),
+                                         Not(square(r2, c2))))
+    return knowledge, Not(square(0, 0))
+
+
+def random_3sat(n, ratio=4.26, seed=0):
+    """round(ratio * n) random clauses of three distinct literals over n symbols."""
+    generator = random.Random(seed)
+    symbols = [Symbol(f"X{i}") for i in range(n)]
+    knowledge = And()
+    for _ in range(round(ratio * n)):
+        literals = []
+        for symbol in generator.sample(symbols, min(3, n)):
+            literals.append(symbol if generator.random() < 0.5 else Not(symbol))
+        knowledge.add(Or(*literals))
+    return knowledge, Or(symbols[0], Not(symbols[-1]))
+
+
+PROBLEMS = {
+    "houses": (houses, [2, 3, 4, 5]),
+    "pigeonhole": (pigeonhole, [2, 3, 4, 5, 6]),
+    "queens": (queens, [2, 3, 4, 5, 6]),
+    "3sat": (random_3sat, [5, 10, 15, 20, 40]),
+}
+
+
+### Backends
+
+BACKENDS = {
+    "model_check": lambda knowledge, query, max_nodes: model_check(
+        knowledge, query),
+    "parallel": lambda knowledge, query, max_nodes: parallel_model_check(
+        knowledge, query),
+    "dpll": lambda knowledge, query, max_nodes: KnowledgeBase(
+        knowledge).ask(query),
+    "bdd": lambda knowledge, query, max_nodes: CompiledKnowledge(
+        knowledge, max_nodes=max_nodes).entails(query),
+}
+
+# Backends whose time doubles with every symbol
+ENUMERATING = {"model_check", "parallel"}
+
+
+def run(problems, backends, limit, max_symbols, max_nodes):
+    """Times every backend on every problem size and cross-checks the answers.
+
+    Yields one row per problem size as soon as it is done. Once a backend
+    takes longer than limit seconds on a problem, it is skipped for the
+    larger sizes of that problem. Enumerating backends are also skipped on
+    problems with more than max_symbols symbols, and a backend that runs
+    out of memory, such as a BDD growing past max_nodes nodes, or out of
+    recursion depth is marked as capped and skipped from then on.
+    """
+    for name in problems:
+        generate, sizes = PROBLEMS[name]
+        slow = set()
+        for size in sizes:
+            knowledge, query = generate(size)
+            row = {
+                "problem": name,
+                "size": size,
+                "symbols": len(knowledge.symbols() | query.symbols()),
+                "times": {},
+                "answers": {},
+                "capped": [],
+            }
+            for backend in backends:
+                if backend in slow or (backend in ENUMERATING and
+                                       row["symbols"] > max_symbols):
+                    continue
+                start = time.perf_counter()
+                try:
+                    answer = BACKENDS[backend](knowledge, query, max_nodes)
+                except (MemoryError, RecursionError):
+                    row["capped"].append(backend)
+                    slow.add(backend)
+                    continue
+                elapsed = time.perf_counter() - start
+                row["times"][backend] = elapsed
+                row["answers"][backend] = answer
+                if elapsed > limit:
+                    slow.add(backend)
+            row["agree"] = len(set(row["answers"].values())) <= 1
+            yield row
+
+
+def header(backends):
+    """Returns the column names of the table for backends."""
+    return ["problem", "size", "symbols"] + list(backends) + ["answer"]
+
+
+def widths(backends):
+    """Returns column widths that fit any row, so rows print as they finish."""
+    return ([max(len(name) for name in PROBLEMS), 4, 7]
+            + [max(len(backend), 9) for backend in backends] + [8])
+
+
+def table_row(row, backends):
+    """Returns the cells of a results row, with times in seconds."""
+    answers = set(row["answers"].values())
+    if not row["agree"]:
+        answer = "MISMATCH"
+    else:
+        answer = str(answers.pop()) if answers else "-"
+    times = []
+    for backend in backends:
+        if backend in row["times"]:
+            times.append(f"{row['times'][backend]:.4f}")
+        elif backend in row["capped"]:
+            times.append("capped")
+        else:
+            times.append("-")
+    return ([row["problem"], str(row["size"]), str(row["symbols"])]
+            + times + [answer])
+
+
+def format_line(cells, widths):
+    """Returns cells left-justified to widths, two spaces apart."""
+    return "  ".join(cell.ljust(width) for cell, width in zip(cells, widths))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the entailment backends on generated problems.")
+    parser.add_argument("--problems", nargs="+", choices=list(PROBLEMS),
+                        default=list(PROBLEMS))
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS),
+                        default=list(BACKENDS))
+    parser.add_argument("--limit", type=float, default=10.0,
+                        help="seconds after which a backend stops scaling up")
+    parser.add_argument("--max-symbols", type=int, default=20,
+                        help="largest problem to give enumerating backends")
+    parser.add_argument("--max-nodes", type=int, default=2_000_000,
+                        help="largest BDD to build, about 400 bytes a node")
+    parser.add_argument("--json", help="file to write the results to, "
+                                       "rewritten after every row")
+    args = parser.parse_args()
+
+    column_widths = widths(args.backends)
+    print(format_line(header(args.backends), column_widths), flush=True)
+    results = []
+    for row in run(args.problems, args.backends, args.limit,
+                   args.max_symbols, args.max_nodes):
+        results.append(row)
+        print(format_line(table_row(row, args.backends), column_widths),
+              flush=True)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    if not all(row["agree"] for row in results):
+        raise SystemExit("backends disagree")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import itertools
+import math
+import multiprocessing
 
 
 class Sentence():
@@ -127,7 +129,7 @@ class And(Sentence):
                            for conjunct in self.conjuncts])
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return set().union(*[conjunct.symbols() for conjunct in self.conjuncts])
 
 
 class Or(Sentence):
@@ -158,7 +160,7 @@ class Or(Sentence):
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return set().union(*[disjunct.symbols() for disjunct in self.disjuncts])
 
 
 class Implication(Sentence):
@@ -218,8 +220,8 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
     def symbols(self):
@@ -229,43 +231,1098 @@ class Biconditional(Sentence):
 def model_check(knowledge, query):
     """Checks if knowledge base entails query."""
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    # Get all symbols in both knowledge and query
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
 
-        # If model has an assignment for each symbol
-        if not symbols:
+    # Check that knowledge entails query
+    return check_all(knowledge, query, symbols, dict())
 
-            # If knowledge base is true in model, then query must also be true
-            #print(model)
-            if knowledge.evaluate(model):
-                
-                return query.evaluate(model)
-               
+
+def check_all(knowledge, query, symbols, model):
+    """Checks if knowledge base entails query in every model extending model.
+
+    The symbols are assigned depth-first in one mutable model. Moving to the
+    next branch flips a single symbol and deeper symbols keep their last
+    values, so consecutive complete models follow a Gray code. A branch is
+    pruned as soon as its partial assignment makes the knowledge base false
+    or makes both the knowledge base and the query true.
+    """
+    model = dict(model)
+    for symbol in symbols:
+        model.setdefault(symbol, True)
+
+    # Symbols at or past this index are not yet assigned
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    def evaluate(sentence, depth):
+        """Evaluates sentence under the first depth symbols, or None if undecided."""
+        if isinstance(sentence, Symbol):
+            if index.get(sentence.name, -1) < depth:
+                return sentence.evaluate(model)
+            return None
+        if isinstance(sentence, Not):
+            value = evaluate(sentence.operand, depth)
+            return None if value is None else not value
+        if isinstance(sentence, (And, Or)):
+            decisive = isinstance(sentence, Or)
+            operands = sentence.disjuncts if decisive else sentence.conjuncts
+            result = not decisive
+            for operand in operands:
+                value = evaluate(operand, depth)
+                if value is decisive:
+                    return decisive
+                if value is None:
+                    result = None
+            return result
+        if isinstance(sentence, Implication):
+            antecedent = evaluate(sentence.antecedent, depth)
+            if antecedent is False:
+                return True
+            consequent = evaluate(sentence.consequent, depth)
+            if consequent is True:
+                return True
+            if antecedent is None or consequent is None:
+                return None
+            return False
+        if isinstance(sentence, Biconditional):
+            left = evaluate(sentence.left, depth)
+            right = evaluate(sentence.right, depth)
+            if left is None or right is None:
+                return None
+            return left == right
+        return sentence.evaluate(model)
+
+    flipped = [False] * len(symbols)
+    depth = 0
+    while True:
+        knows = evaluate(knowledge, depth)
+        descend = False
+        if knows is not False:
+            holds = evaluate(query, depth)
+
+            # Every completion of this assignment is a counter-model
+            if knows is True and holds is False:
+                return False
+
+            # Otherwise keep going unless the whole branch is settled
+            descend = not (knows is True and holds is True)
+
+        if descend and depth < len(symbols):
+            flipped[depth] = False
+            depth += 1
+            continue
+
+        # Backtrack to the deepest symbol whose other value is untried
+        while depth > 0 and flipped[depth - 1]:
+            depth -= 1
+        if depth == 0:
             return True
+        flipped[depth - 1] = True
+        symbol = symbols[depth - 1]
+        model[symbol] = not model[symbol]
+
+
+ENTAILED = "entailed"
+REFUTED = "refuted"
+UNKNOWN = "unknown"
+
+
+def model_check_all(knowledge, queries):
+    """Checks several queries against a knowledge base in one pass.
+
+    Every model is enumerated once and all still-undecided queries are
+    evaluated in it. Returns a list with one result per query: ENTAILED if
+    the query is true in every model of the knowledge base, REFUTED if it is
+    false in every such model, and UNKNOWN otherwise. As with model_check,
+    an unsatisfiable knowledge base entails every query.
+    """
+    queries = list(queries)
+
+    # Get all symbols in both knowledge and the queries
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+
+    # Whether each query has been true / false in some model of the knowledge
+    seen_true = [False] * len(queries)
+    seen_false = [False] * len(queries)
+    undecided = list(range(len(queries)))
+
+    for values in itertools.product((True, False), repeat=len(symbols)):
+
+        # Stop as soon as every query is known to be UNKNOWN
+        if not undecided:
+            break
+
+        model = dict(zip(symbols, values))
+        if not knowledge.evaluate(model):
+            continue
+
+        # A query stays undecided until it has been both true and false
+        remaining = []
+        for i in undecided:
+            if queries[i].evaluate(model):
+                seen_true[i] = True
+            else:
+                seen_false[i] = True
+            if not (seen_true[i] and seen_false[i]):
+                remaining.append(i)
+        undecided = remaining
+
+    results = []
+    for true, false in zip(seen_true, seen_false):
+        if not false:
+            results.append(ENTAILED)
+        elif not true:
+            results.append(REFUTED)
         else:
+            results.append(UNKNOWN)
+    return results
+
+
+# Numbers the symbols to_cnf introduces; their names are ("cnf", number)
+# tuples, which no Symbol name can equal
+_cnf_names = itertools.count()
+
+
+def to_cnf(sentence):
+    """Returns the clauses of a sentence in conjunctive normal form.
+
+    Each clause is a frozenset of (symbol name, value) literals and the
+    sentence holds exactly when every clause has a literal that the model
+    agrees with. Tautological clauses are dropped. Rather than distributing
+    a disjunction over several operands that are not single clauses, all
+    but the largest are replaced by new symbols defined to be equivalent to
+    them (a Tseitin encoding), so the clauses grow linearly with the
+    sentence. Each model of the sentence then extends to exactly one model
+    of the clauses, which keeps model counts unchanged.
+    """
+    definitions = []
+
+    def define(clauses):
+        """Returns a literal for a new symbol equivalent to the conjunction of clauses."""
+        parts = []
+        for clause in clauses:
+            if len(clause) == 1:
+                parts.extend(clause)
+                continue
+            # A new symbol equivalent to the disjunction of the clause
+            name = ("cnf", next(_cnf_names))
+            definitions.append(clause | {(name, False)})
+            for literal_name, value in clause:
+                definitions.append(frozenset([(name, True),
+                                              (literal_name, not value)]))
+            parts.append((name, True))
+
+        name = ("cnf", next(_cnf_names))
+        for part in parts:
+            definitions.append(frozenset([(name, False), part]))
+        definitions.append(frozenset([(name, True)] +
+                                     [(part_name, not value)
+                                      for part_name, value in parts]))
+        return (name, True)
+
+    def convert(sentence, positive):
+        """Returns the clauses of sentence, or of its negation if not positive."""
+        if isinstance(sentence, Symbol):
+            return [frozenset([(sentence.name, positive)])]
+        if isinstance(sentence, Not):
+            return convert(sentence.operand, not positive)
+        if isinstance(sentence, Implication):
+            if positive:
+                return convert(Or(Not(sentence.antecedent),
+                                  sentence.consequent), True)
+            return (convert(sentence.antecedent, True) +
+                    convert(sentence.consequent, False))
+        if isinstance(sentence, Biconditional):
+            left, right = sentence.left, sentence.right
+            if positive:
+                return (convert(Or(Not(left), right), True) +
+                        convert(Or(left, Not(right)), True))
+            return (convert(Or(left, right), True) +
+                    convert(Or(Not(left), Not(right)), True))
+        if isinstance(sentence, And):
+            operands, conjunctive = sentence.conjuncts, positive
+        elif isinstance(sentence, Or):
+            operands, conjunctive = sentence.disjuncts, not positive
+        else:
+            raise TypeError("must be a logical sentence")
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-           
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+        # A conjunction just collects the clauses of its operands
+        if conjunctive:
+            clauses = []
+            for operand in operands:
+                clauses.extend(convert(operand, positive))
+            return clauses
+
+        # A disjunction distributes only over the clauses of its largest
+        # operand; the other operands join as one clause or a new symbol
+        converted = [convert(operand, positive) for operand in operands]
+        if not all(converted):
+            return []  # Some operand always holds
+        largest = max(range(len(converted)),
+                      key=lambda i: len(converted[i]), default=None)
+        literals = set()
+        for i, clauses in enumerate(converted):
+            if i == largest:
+                continue
+            if len(clauses) == 1:
+                literals |= clauses[0]
+            else:
+                literals.add(define(clauses))
+        if largest is None:
+            return [frozenset(literals)]
+        return [clause | literals for clause in converted[largest]]
+
+    clauses = []
+    seen = set()
+    for clause in convert(sentence, True) + definitions:
+        if clause in seen or any((name, not value) in clause
+                                 for name, value in clause):
+            continue
+        seen.add(clause)
+        clauses.append(clause)
+    return clauses
+
+
+def dpll_satisfiable(clauses, model=None):
+    """Returns a model satisfying every clause, or None if there is none.
+
+    Clauses are in the form produced by to_cnf. The search starts from the
+    (partial) model given, which acts as a set of assumptions. The returned
+    model only assigns the symbols the search needed; any value for the
+    other symbols also satisfies the clauses. Assignments are recorded on a
+    trail and undone on backtracking, so the search is not bounded by the
+    recursion limit.
+    """
+    clauses = list(clauses)
+    occurrences = {}  # Map from symbol name to indices of clauses using it
+    for i, clause in enumerate(clauses):
+        for name, _ in clause:
+            occurrences.setdefault(name, []).append(i)
+    model = dict(model or {})
+    trail = []  # Symbol names in the order the search assigned them
+
+    def propagate(pending):
+        """Assigns unit clauses among the indices pending until none are left.
+
+        Returns False if some clause has every literal false.
+        """
+        while pending:
+            free = []
+            for name, value in clauses[pending.pop()]:
+                if name not in model:
+                    free.append((name, value))
+                elif model[name] == value:
+                    break
+            else:
+                if not free:
+                    return False
+                if len(free) == 1:
+                    name, value = free[0]
+                    model[name] = value
+                    trail.append(name)
+                    pending.extend(occurrences[name])
+        return True
+
+    def branch():
+        """Returns a literal of the shortest unsatisfied clause, or None."""
+        best = None
+        for clause in clauses:
+            free = []
+            for name, value in clause:
+                if name not in model:
+                    free.append((name, value))
+                elif model[name] == value:
+                    break
+            else:
+                if best is None or len(free) < len(best):
+                    best = free
+                    # Units are propagated, so no clause is shorter than two
+                    if len(best) <= 2:
+                        break
+        return best[0] if best else None
+
+    if not propagate(list(range(len(clauses)))):
+        return None
+
+    # Each decision is (trail length before it, name, value, whether the
+    # other value was already tried)
+    decisions = []
+    literal = branch()
+    while literal is not None:
+        name, value = literal
+        decisions.append((len(trail), name, value, False))
+        model[name] = value
+        trail.append(name)
+        while not propagate(list(occurrences[name])):
+            # Undo back to the latest decision with a value left to try
+            while decisions and decisions[-1][3]:
+                decisions.pop()
+            if not decisions:
+                return None
+            size, name, value, _ = decisions.pop()
+            for undone in trail[size:]:
+                del model[undone]
+            del trail[size:]
+            decisions.append((size, name, not value, True))
+            model[name] = not value
+            trail.append(name)
+        literal = branch()
+    return model
+
+
+class KnowledgeBase():
+    """A knowledge base that is queried as sentences are added to it.
+
+    Sentences are converted to clauses once, when they are added, and facts
+    implied by unit propagation are kept up to date incrementally. Answers
+    to queries are cached: proofs of entailment stay valid as knowledge is
+    added, and a counter-model found for a query is only re-checked against
+    the clauses added since. push and pop open and retract scopes of
+    knowledge.
+    """
+
+    def __init__(self, *sentences):
+        self.knowledge = And()
+        self.clauses = []
+        self.occurrences = {}  # Map from symbol to indices of its clauses
+        self.counts = {}  # Map from symbol to number of sentences using it
+        self.assignment = {}  # Values implied by unit propagation
+        self.trail = []  # Symbols in the order they were assigned
+        self.consistent = True
+        self.scopes = []
+
+        # Map from query to number of clauses when its entailment was proved
+        self.entailed = {}
+
+        # Map from query to (counter-model, number of clauses it satisfies)
+        self.witnesses = {}
+
+        for sentence in sentences:
+            self.add(sentence)
 
-    print(symbols)
+    def __repr__(self):
+        return f"KnowledgeBase({self.knowledge})"
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        self.knowledge.add(sentence)
+        for symbol in sentence.symbols():
+            self.counts[symbol] = self.counts.get(symbol, 0) + 1
+
+        added = []
+        for clause in to_cnf(sentence):
+            index = len(self.clauses)
+            self.clauses.append(clause)
+            for name, _ in clause:
+                self.occurrences.setdefault(name, []).append(index)
+            added.append(index)
+        self.propagate(added)
+
+    def propagate(self, pending):
+        """Assigns the symbols forced by the clauses at the given indices."""
+        pending = list(pending)
+        while pending and self.consistent:
+            clause = self.clauses[pending.pop()]
+            literals = []
+            for name, value in clause:
+                if name not in self.assignment:
+                    literals.append((name, value))
+                elif self.assignment[name] == value:
+                    break
+            else:
+                if not literals:
+                    self.consistent = False
+                elif len(literals) == 1:
+                    name, value = literals[0]
+                    self.assignment[name] = value
+                    self.trail.append(name)
+                    pending.extend(self.occurrences[name])
+
+    def push(self):
+        """Opens a scope whose knowledge is retracted by the matching pop."""
+        self.scopes.append((len(self.knowledge.conjuncts), len(self.clauses),
+                            len(self.trail), self.consistent))
+
+    def pop(self):
+        """Retracts all knowledge added since the matching push."""
+        if not self.scopes:
+            raise IndexError("pop without matching push")
+        sentences, clauses, trail, consistent = self.scopes.pop()
+
+        for sentence in self.knowledge.conjuncts[sentences:]:
+            for symbol in sentence.symbols():
+                self.counts[symbol] -= 1
+                if not self.counts[symbol]:
+                    del self.counts[symbol]
+        del self.knowledge.conjuncts[sentences:]
+
+        for clause in self.clauses[clauses:]:
+            for name, _ in clause:
+                indices = self.occurrences.get(name, [])
+                while indices and indices[-1] >= clauses:
+                    indices.pop()
+                if not indices:
+                    self.occurrences.pop(name, None)
+        del self.clauses[clauses:]
+
+        for name in self.trail[trail:]:
+            del self.assignment[name]
+        del self.trail[trail:]
+        self.consistent = consistent
+
+        # Proofs may rely on retracted clauses; counter-models remain valid
+        self.entailed = {query: size for query, size in self.entailed.items()
+                         if size <= clauses}
+        self.witnesses = {query: (model, min(size, clauses))
+                          for query, (model, size) in self.witnesses.items()}
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    def symbols(self):
+        """Returns a set of all symbols in the knowledge base."""
+        return set(self.counts)
+
+    def satisfiable(self, *assumptions):
+        """Returns a model of the knowledge base and the assumptions, or None."""
+        if not self.consistent:
+            return None
+        clauses = list(self.clauses)
+        symbols = self.symbols()
+        for sentence in assumptions:
+            clauses.extend(to_cnf(sentence))
+            symbols |= sentence.symbols()
+        model = dpll_satisfiable(clauses, self.assignment)
+        if model is None:
+            return None
+        # Leave out the symbols to_cnf introduced
+        return {symbol: model.get(symbol, False) for symbol in symbols}
+
+    def counter_model(self, query):
+        """Returns a model of the knowledge base in which query is false, or None."""
+        if query in self.entailed:
+            return None
+
+        # A previous counter-model only needs checking against new clauses
+        if query in self.witnesses:
+            model, size = self.witnesses[query]
+            if all(any(model.get(name) == value for name, value in clause)
+                   for clause in self.clauses[size:]):
+                self.witnesses[query] = (model, len(self.clauses))
+                return model
+
+        model = self.satisfiable(Not(query))
+        if model is None:
+            self.entailed[query] = len(self.clauses)
+            self.witnesses.pop(query, None)
+        else:
+            self.witnesses[query] = (model, len(self.clauses))
+        return model
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.counter_model(query) is None
+
+    def ask_all(self, queries):
+        """Checks several queries, returning ENTAILED, REFUTED or UNKNOWN for each.
+
+        Models found while answering one query are reused to answer the
+        others before the solver is called again.
+        """
+
+        def holds(query, model):
+            """Evaluates query, giving symbols unknown to the model any value."""
+            missing = {symbol: False for symbol in query.symbols()
+                       if symbol not in model}
+            return query.evaluate({**model, **missing} if missing else model)
+
+        models = []
+        results = []
+        for query in queries:
+            counter = next((model for model in models
+                            if not holds(query, model)), None)
+            if counter is None:
+                counter = self.counter_model(query)
+                if counter is not None:
+                    models.append(counter)
+
+            support = next((model for model in models
+                            if holds(query, model)), None)
+            if support is None:
+                support = self.counter_model(Not(query))
+                if support is not None:
+                    models.append(support)
+
+            if counter is None:
+                results.append(ENTAILED)
+            elif support is None:
+                results.append(REFUTED)
+            else:
+                results.append(UNKNOWN)
+        return results
+
+
+def horn_clauses(knowledge):
+    """Returns the knowledge base as definite clauses, or None if it is not Horn.
+
+    Each clause is a (premises, conclusion) pair where premises is a
+    frozenset of symbol names and conclusion is a symbol name. Facts are
+    clauses without premises. The knowledge must be built from symbols,
+    conjunctions and implications whose antecedent is a symbol or a
+    conjunction of symbols.
+    """
+
+    def atoms(sentence):
+        """Returns the names of a symbol or a conjunction of symbols, or None."""
+        if isinstance(sentence, Symbol):
+            return [sentence.name]
+        if isinstance(sentence, And):
+            names = []
+            for conjunct in sentence.conjuncts:
+                conjunct_names = atoms(conjunct)
+                if conjunct_names is None:
+                    return None
+                names.extend(conjunct_names)
+            return names
+        return None
+
+    clauses = []
+    pending = [knowledge]
+    while pending:
+        sentence = pending.pop()
+        if isinstance(sentence, And):
+            pending.extend(reversed(sentence.conjuncts))
+        elif isinstance(sentence, Symbol):
+            clauses.append((frozenset(), sentence.name))
+        elif isinstance(sentence, Implication):
+            premises = atoms(sentence.antecedent)
+            conclusions = atoms(sentence.consequent)
+            if premises is None or conclusions is None:
+                return None
+            for conclusion in conclusions:
+                clauses.append((frozenset(premises), conclusion))
+        else:
+            return None
+    return clauses
+
+
+def forward_chain(knowledge, query):
+    """Checks if a Horn knowledge base entails the symbol query.
+
+    Runs in time linear in the size of the knowledge base: each clause keeps
+    a count of premises not yet inferred and fires when it reaches zero.
+    """
+    clauses = horn_clauses(knowledge)
+    if clauses is None:
+        raise ValueError("knowledge base is not a set of Horn clauses")
+    return _forward_chain(clauses, {query.name})
+
+
+def _forward_chain(clauses, goals):
+    """Checks if Horn clauses from horn_clauses entail every symbol name in goals."""
+    count = [len(premises) for premises, _ in clauses]
+    uses = {}  # Map from symbol to indices of clauses using it as a premise
+    for i, (premises, _) in enumerate(clauses):
+        for premise in premises:
+            uses.setdefault(premise, []).append(i)
+
+    remaining = set(goals)
+    agenda = [conclusion for premises, conclusion in clauses if not premises]
+    inferred = set()
+    while agenda and remaining:
+        symbol = agenda.pop()
+        remaining.discard(symbol)
+        if symbol in inferred:
+            continue
+        inferred.add(symbol)
+        for i in uses.get(symbol, []):
+            count[i] -= 1
+            if count[i] == 0:
+                agenda.append(clauses[i][1])
+    return not remaining
+
+
+def backward_chain(knowledge, query):
+    """Checks if a Horn knowledge base entails the symbol query.
+
+    Works back from the query, only visiting clauses that could conclude a
+    goal. Proved goals are remembered, as are failed goals whose failure
+    did not depend on a goal still being proved further up. Goals are kept
+    on an explicit stack, so long chains of rules do not hit the recursion
+    limit.
+    """
+    clauses = horn_clauses(knowledge)
+    if clauses is None:
+        raise ValueError("knowledge base is not a set of Horn clauses")
+
+    rules = {}  # Map from symbol to premises of clauses concluding it
+    for premises, conclusion in clauses:
+        rules.setdefault(conclusion, []).append(premises)
+
+    proved = set()
+    failed = set()
+    goals = set()  # Goals on the current path
+    # Frames are [goal, remaining premise sets, remaining premises of the
+    # current set or None, whether the proof used a goal on the path]
+    stack = []
+
+    def enter(goal):
+        """Returns (proved, used pending goal) if known, else starts proving goal."""
+        if goal in proved:
+            return True, False
+        if goal in failed:
+            return False, False
+        if goal in goals:
+            return False, True
+        goals.add(goal)
+        stack.append([goal, iter(rules.get(goal, [])), None, False])
+        return None
+
+    result = enter(query.name)
+    while stack:
+        frame = stack[-1]
+        goal = frame[0]
+        if result is not None:
+            # A premise of the current premise set has been settled
+            premise_proved, used_pending = result
+            result = None
+            frame[3] = frame[3] or used_pending
+            if not premise_proved:
+                frame[2] = None
+
+        if frame[2] is not None:
+            premise = next(frame[2], None)
+            if premise is None:
+                # Every premise of this set holds
+                goals.remove(goal)
+                proved.add(goal)
+                stack.pop()
+                result = (True, False)
+            else:
+                result = enter(premise)
+            continue
+
+        premises = next(frame[1], None)
+        if premises is None:
+            # No premise set left to try
+            goals.remove(goal)
+            if not frame[3]:
+                failed.add(goal)
+            stack.pop()
+            result = (False, frame[3])
+        else:
+            frame[2] = iter(premises)
+    return result[0]
+
+
+def entails(knowledge, query):
+    """Checks if knowledge base entails query.
+
+    Horn knowledge bases with a symbol or conjunction of symbols as the
+    query are answered by forward chaining, converting the knowledge base
+    to clauses once; anything else falls back to model_check.
+    """
+    clauses = horn_clauses(knowledge)
+    if clauses is not None:
+        if isinstance(query, Symbol):
+            return _forward_chain(clauses, {query.name})
+        if (isinstance(query, And)
+                and all(isinstance(conjunct, Symbol)
+                        for conjunct in query.conjuncts)):
+            return _forward_chain(clauses, {conjunct.name
+                                            for conjunct in query.conjuncts})
+    return model_check(knowledge, query)
+
+
+def _propagate(clauses, literals=()):
+    """Returns the clauses left after unit propagation and the literals made true.
+
+    Propagation starts from the given literals and the unit clauses, and
+    returns None if it reaches a conflict.
+    """
+    true = set(literals)
+    for clause in clauses:
+        if len(clause) <= 1:
+            if not clause:
+                return None
+            true |= clause
+    if not true:
+        return clauses, true
+
+    # A few passes condition the clauses on the literals so far with set
+    # operations, which settles most formulas
+    for _ in range(4):
+        false = {(name, not value) for name, value in true}
+        if not true.isdisjoint(false):
+            return None
+        touched = true | false
+        remaining = []
+        units = []
+        for clause in clauses:
+            if clause.isdisjoint(touched):
+                remaining.append(clause)
+            elif clause.isdisjoint(true):
+                clause = clause - false
+                if not clause:
+                    return None
+                if len(clause) == 1:
+                    units.append(clause)
+                remaining.append(clause)
+        clauses = remaining
+        if not units:
+            return clauses, true
+        true.update(*units)
+    units = [next(iter(unit)) for unit in units]
+
+    # Further units are propagated through an index of clauses by symbol
+    occurrences = {}
+    for i, clause in enumerate(clauses):
+        for name, _ in clause:
+            occurrences.setdefault(name, []).append(i)
+    model = {}
+    while units:
+        name, value = units.pop()
+        if name in model:
+            if model[name] != value:
+                return None
+            continue
+        model[name] = value
+        for i in occurrences[name]:
+            free = []
+            for literal in clauses[i]:
+                if literal[0] not in model:
+                    free.append(literal)
+                elif model[literal[0]] == literal[1]:
+                    break
+            else:
+                if not free:
+                    return None
+                if len(free) == 1:
+                    units.append(free[0])
+
+    true.update(model.items())
+    remaining = []
+    for clause in clauses:
+        if any(model.get(name) == value for name, value in clause):
+            continue
+        remaining.append(frozenset(literal for literal in clause
+                                   if literal[0] not in model))
+    return remaining, true
+
+
+def count_models(knowledge, symbols=()):
+    """Returns the number of models of knowledge base.
+
+    Models are counted over the symbols of the knowledge base together with
+    any extra symbols given. Counting is DPLL-style: unit clauses are
+    propagated before branching, clauses that share no symbols are counted
+    independently and the counts of clause sets already seen are cached.
+    The search runs on an explicit stack, so it is not bounded by the
+    recursion limit.
+    """
+    symbols = knowledge.symbols() | set(symbols)
+    cache = {}
+
+    def components(clauses):
+        """Splits clauses into (names, clauses, uses) groups that share no symbols.
+
+        The map uses from symbol name to the clauses using it is shared by
+        every group.
+        """
+        uses = {}  # Map from symbol name to the clauses using it
+        for clause in clauses:
+            for name, _ in clause:
+                uses.setdefault(name, []).append(clause)
+        groups = []
+        seen = set()
+        for start in uses:
+            if start in seen:
+                continue
+            seen.add(start)
+            names = [start]
+            group = set()
+            for name in names:
+                for clause in uses[name]:
+                    if clause not in group:
+                        group.add(clause)
+                        for other, _ in clause:
+                            if other not in seen:
+                                seen.add(other)
+                                names.append(other)
+            groups.append((names, list(group), uses))
+        return groups
+
+    # Tasks are ("formula", clauses, names, literals) to count the models of
+    # clauses over names once literals are made true, ("component", names,
+    # clauses, uses) for clauses that cannot be split further, and
+    # ("sum", key) or ("product", count, factor) to combine the last results
+    # on the values stack.
+    clauses = to_cnf(knowledge)
+    mentioned = {name for clause in clauses for name, _ in clause}
+    tasks = [("formula", clauses, mentioned, ())]
+    values = []
+    while tasks:
+        task = tasks.pop()
+        kind = task[0]
+        if kind == "formula":
+            _, clauses, names, literals = task
+            propagated = _propagate(clauses, literals)
+            if propagated is None:
+                values.append(0)
+                continue
+            clauses, model = propagated
+            groups = components(clauses)
+            free = len(names) - len(model) - sum(len(group[0])
+                                                 for group in groups)
+            tasks.append(("product", len(groups), 2 ** free))
+            for group in groups:
+                tasks.append(("component",) + group)
+        elif kind == "component":
+            _, names, clauses, uses = task
+            key = frozenset(clauses)
+            if key in cache:
+                values.append(cache[key])
+                continue
+            # Branch on a symbol of the shortest clause that propagation
+            # leaves alone, longer than two literals, then on the symbol
+            # occurring in the most clauses
+            shortest = {}
+            for clause in clauses:
+                if len(clause) > 2:
+                    for name, _ in clause:
+                        shortest[name] = min(shortest.get(name, len(clause)),
+                                             len(clause))
+            name = max(names, key=lambda name: (-shortest.get(name, math.inf),
+                                                len(uses[name])))
+            tasks.append(("sum", key))
+            for value in (True, False):
+                tasks.append(("formula", clauses, names, [(name, value)]))
+        elif kind == "sum":
+            total = values.pop() + values.pop()
+            cache[task[1]] = total
+            values.append(total)
+        else:
+            _, count, factor = task
+            total = factor
+            for _ in range(count):
+                total *= values.pop()
+            values.append(total)
+
+    return values.pop() * 2 ** len(symbols - mentioned)
+
+
+def iter_models(knowledge, symbols=()):
+    """Yields each model of knowledge base, one at a time.
+
+    Models assign every symbol of the knowledge base and any extra symbols
+    given. The search propagates unit clauses and only descends into
+    assignments that leave every clause satisfiable so far, so no list of
+    models is ever built. It runs on an explicit stack, so it is not
+    bounded by the recursion limit.
+    """
+    symbols = sorted(knowledge.symbols() | set(symbols))
+
+    # Each entry is (clauses, literals to make true, assigned), where
+    # assigned links the sets of literals made true on the way down as
+    # (literals, parent assigned) pairs, so branches share them
+    stack = [(to_cnf(knowledge), (), None)]
+    while stack:
+        clauses, literals, assigned = stack.pop()
+        propagated = _propagate(clauses, literals)
+        if propagated is None:
+            continue
+        clauses, true = propagated
+        assigned = (true, assigned)
+        if clauses:
+            # Branch on a literal of the shortest clause
+            name, value = next(iter(min(clauses, key=len)))
+            stack.append((clauses, [(name, not value)], assigned))
+            stack.append((clauses, [(name, value)], assigned))
+            continue
+
+        model = {}
+        while assigned is not None:
+            true, assigned = assigned
+            model.update(true)
+        # Symbols to_cnf introduced are left out of the models
+        model = {symbol: model[symbol] for symbol in symbols if symbol in model}
+        free = [symbol for symbol in symbols if symbol not in model]
+        for values in itertools.product((True, False), repeat=len(free)):
+            yield {**model, **dict(zip(free, values))}
+
+
+# Knowledge, query and unfixed symbols shared by parallel_model_check workers
+_parallel_task = None
+
+
+def _init_parallel_task(knowledge, query, symbols):
+    global _parallel_task
+    _parallel_task = (knowledge, query, symbols)
+
+
+def _check_cube(cube):
+    """Checks entailment in every model extending the assignment cube."""
+    knowledge, query, symbols = _parallel_task
+    return check_all(knowledge, query, symbols, dict(cube))
+
+
+def parallel_model_check(knowledge, query, processes=None, prefix=None):
+    """Checks if knowledge base entails query, using a pool of processes.
+
+    The models are split into cubes by fixing the prefix symbols that occur
+    most often, and each cube is checked by a worker. As soon as one worker
+    finds a model of the knowledge base where query is false, the others
+    are stopped. By default there are about four cubes per process.
+    """
+    processes = processes or multiprocessing.cpu_count()
+
+    def count(sentence, occurrences):
+        """Adds the number of times each symbol occurs in sentence."""
+        if isinstance(sentence, Symbol):
+            occurrences[sentence.name] = occurrences.get(sentence.name, 0) + 1
+        elif isinstance(sentence, Not):
+            count(sentence.operand, occurrences)
+        elif isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                count(conjunct, occurrences)
+        elif isinstance(sentence, Or):
+            for disjunct in sentence.disjuncts:
+                count(disjunct, occurrences)
+        elif isinstance(sentence, Implication):
+            count(sentence.antecedent, occurrences)
+            count(sentence.consequent, occurrences)
+        elif isinstance(sentence, Biconditional):
+            count(sentence.left, occurrences)
+            count(sentence.right, occurrences)
+
+    # Order symbols so the most constrained ones are fixed first
+    occurrences = {}
+    count(knowledge, occurrences)
+    count(query, occurrences)
+    symbols = sorted(occurrences, key=lambda name: (-occurrences[name], name))
+
+    if prefix is None:
+        prefix = (4 * processes - 1).bit_length()
+    prefix = min(prefix, len(symbols))
+    fixed, rest = symbols[:prefix], symbols[prefix:]
+    cubes = [list(zip(fixed, values))
+             for values in itertools.product((True, False), repeat=prefix)]
+
+    with multiprocessing.Pool(processes, initializer=_init_parallel_task,
+                              initargs=(knowledge, query, rest)) as pool:
+        for result in pool.imap_unordered(_check_cube, cubes):
+            if not result:
+                # Leaving the block terminates the remaining workers
+                return False
+    return True
+
+
+def simplify(sentence):
+    """Returns a smaller sentence with the same models.
+
+    Nested conjunctions and disjunctions are flattened, repeated operands
+    removed, implications and disjunctions between literals rewritten as
+    one canonical clause (so a => ¬b and b => ¬a coincide), and symbols
+    fixed by top-level facts are replaced by their values throughout. The
+    facts are kept as conjuncts of the result. A sentence that simplifies
+    to true becomes And() and one that simplifies to false becomes Or().
+    """
+
+    def literal(sentence):
+        """Returns (name, value) if sentence is a literal, otherwise None."""
+        if isinstance(sentence, Symbol):
+            return sentence.name, True
+        if isinstance(sentence, Not) and isinstance(sentence.operand, Symbol):
+            return sentence.operand.name, False
+        return None
+
+    def negate(sentence):
+        if isinstance(sentence, bool):
+            return not sentence
+        if isinstance(sentence, Not):
+            return sentence.operand
+        return Not(sentence)
+
+    def clause(literals):
+        """Returns the disjunction of literals in a canonical order."""
+        return Or(*sorted(literals, key=lambda sentence: (
+            literal(sentence)[0], not literal(sentence)[1])))
+
+    def combine(operands, conjunctive, facts):
+        """Simplifies a conjunction or disjunction, with True/False for constants."""
+        kind = And if conjunctive else Or
+        flat = []
+        pending = list(reversed(operands))
+        while pending:
+            operand = reduce(pending.pop(), facts)
+            if isinstance(operand, kind):
+                pending.extend(reversed(operand.conjuncts if conjunctive
+                                        else operand.disjuncts))
+            elif operand is conjunctive:
+                continue
+            elif operand is (not conjunctive):
+                return not conjunctive
+            else:
+                flat.append(operand)
+
+        # Drop repeats, and stop at a complementary pair
+        unique = list(dict.fromkeys(flat))
+        present = set(unique)
+        if any(negate(operand) in present for operand in unique):
+            return not conjunctive
+        if not unique:
+            return conjunctive
+        if len(unique) == 1:
+            return unique[0]
+        if not conjunctive and all(literal(operand) for operand in unique):
+            return clause(unique)
+        return kind(*unique)
+
+    def reduce(sentence, facts):
+        """Simplifies sentence under facts, with True/False for constants."""
+        if isinstance(sentence, Symbol):
+            return facts.get(sentence.name, sentence)
+        if isinstance(sentence, Not):
+            return negate(reduce(sentence.operand, facts))
+        if isinstance(sentence, And):
+            return combine(sentence.conjuncts, True, facts)
+        if isinstance(sentence, Or):
+            return combine(sentence.disjuncts, False, facts)
+        if isinstance(sentence, Implication):
+            return combine([Not(sentence.antecedent), sentence.consequent],
+                           False, facts)
+        if isinstance(sentence, Biconditional):
+            left = reduce(sentence.left, facts)
+            right = reduce(sentence.right, facts)
+            if isinstance(left, bool):
+                left, right = right, left
+            if isinstance(right, bool):
+                return left if right else negate(left)
+            if left == right:
+                return True
+            if left == negate(right):
+                return False
+            return Biconditional(left, right)
+        raise TypeError("must be a logical sentence")
+
+    # Propagate top-level facts until no new ones appear
+    facts = {}
+    while True:
+        result = reduce(sentence, facts)
+        if isinstance(result, bool):
+            break
+        conjuncts = result.conjuncts if isinstance(result, And) else [result]
+        units = [literal(conjunct) for conjunct in conjuncts
+                 if literal(conjunct)]
+        if not units:
+            break
+        facts.update(units)
+        sentence = result
+
+    if result is False:
+        return Or()
+    parts = [Symbol(name) if value else Not(Symbol(name))
+             for name, value in facts.items()]
+    if result is not True:
+        parts.extend(result.conjuncts if isinstance(result, And) else [result])
+    if len(parts) == 1:
+        return parts[0]
+    return And(*parts)
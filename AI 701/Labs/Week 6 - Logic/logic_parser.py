@@ -0,0 +1,312 @@
+import re
+
+from logic import *
+
+
+# Tokens of the language formula() emits, with ASCII equivalents
+TOKEN = re.compile(r"""\s*(?:
+    (?P<iff><=>|<->) |
+    (?P<implies>=>|->) |
+    (?P<and>∧|&) |
+    (?P<or>∨|\|) |
+    (?P<not>¬|~|!) |
+    (?P<open>\() |
+    (?P<close>\)) |
+    (?P<symbol>[A-Za-z_][A-Za-z0-9_]*)
+)""", re.VERBOSE)
+
+PRECEDENCE = {"iff": 0, "implies": 1, "or": 2, "and": 3, "not": 4}
+
+
+def parse(text):
+    """Returns the sentence written in text.
+
+    Accepts the syntax formula() produces (¬ ∧ ∨ => <=>) as well as the
+    ASCII operators ~ or !, &, |, -> and <->. Conjunctions and disjunctions
+    in a chain become one And or Or, => groups to the right and <=> to the
+    left. Parsing is iterative and linear in the length of the text.
+    """
+    operands = []
+    operators = []  # Entries are [kind, number of operands - 1]
+
+    def reduce():
+        """Applies the operator on top of the stack to its operands."""
+        kind, arity = operators.pop()
+        if kind == "not":
+            operands.append(Not(operands.pop()))
+        elif kind in ("and", "or"):
+            items = operands[-arity - 1:]
+            del operands[-arity - 1:]
+            operands.append(And(*items) if kind == "and" else Or(*items))
+        else:
+            right = operands.pop()
+            left = operands.pop()
+            if kind == "implies":
+                operands.append(Implication(left, right))
+            else:
+                operands.append(Biconditional(left, right))
+
+    def error(message, position):
+        return ValueError(f"{message} at position {position}: {text!r}")
+
+    expect_operand = True
+    position = 0
+    end = len(text.rstrip())
+    while position < end:
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise error("unexpected character", position)
+        kind = match.lastgroup
+        start = match.start(kind)
+        position = match.end()
+
+        if kind in ("symbol", "not", "open"):
+            if not expect_operand:
+                raise error(f"unexpected {match.group(kind)!r}", start)
+            if kind == "symbol":
+                operands.append(Symbol(match.group(kind)))
+                expect_operand = False
+            else:
+                operators.append([kind, 0])
+            continue
+
+        if expect_operand:
+            raise error(f"unexpected {match.group(kind)!r}", start)
+
+        if kind == "close":
+            while operators and operators[-1][0] != "open":
+                reduce()
+            if not operators:
+                raise error("unbalanced ')'", start)
+            operators.pop()
+            continue
+
+        # Binary operator: reduce tighter operators first; <=> is left
+        # associative, everything else groups to the right or is n-ary
+        precedence = PRECEDENCE[kind]
+        while (operators and operators[-1][0] != "open"
+               and (PRECEDENCE[operators[-1][0]] > precedence
+                    or kind == "iff" and operators[-1][0] == "iff")):
+            reduce()
+        if kind in ("and", "or") and operators and operators[-1][0] == kind:
+            operators[-1][1] += 1
+        else:
+            operators.append([kind, 1])
+        expect_operand = True
+
+    if expect_operand:
+        raise error("expected a sentence", position)
+    while operators:
+        if operators[-1][0] == "open":
+            raise error("unbalanced '('", position)
+        reduce()
+    return operands.pop()
+
+
+def serialize(sentence):
+    """Returns the text of sentence in the syntax parse() reads.
+
+    Unlike formula(), which rescans each subformula for balanced
+    parentheses, this runs iteratively in time linear in the output.
+    """
+    parts = []
+    pending = [sentence]
+
+    def operand(sentence):
+        """Returns the items writing sentence as an operand."""
+        while (isinstance(sentence, And) and len(sentence.conjuncts) == 1
+               or isinstance(sentence, Or) and len(sentence.disjuncts) == 1):
+            sentence = (sentence.conjuncts[0] if isinstance(sentence, And)
+                        else sentence.disjuncts[0])
+        if isinstance(sentence, Symbol):
+            return [sentence]
+        return [")", sentence, "("]
+
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, Symbol):
+            parts.append(item.name)
+        elif isinstance(item, Not):
+            pending.extend(operand(item.operand))
+            parts.append("¬")
+        elif isinstance(item, (And, Or)):
+            if isinstance(item, And):
+                items, separator = item.conjuncts, " ∧ "
+            else:
+                items, separator = item.disjuncts, " ∨ "
+            if not items:
+                raise ValueError("cannot serialize an empty "
+                                 f"{type(item).__name__}")
+            if len(items) == 1:
+                pending.append(items[0])
+                continue
+            for i, child in enumerate(reversed(items)):
+                if i:
+                    pending.append(separator)
+                pending.extend(operand(child))
+        elif isinstance(item, Implication):
+            pending.extend(operand(item.consequent))
+            pending.append(" => ")
+            pending.extend(operand(item.antecedent))
+        elif isinstance(item, Biconditional):
+            pending.extend(operand(item.right))
+            pending.append(" <=> ")
+            pending.extend(operand(item.left))
+        else:
+            raise TypeError("must be a logical sentence")
+    return "".join(parts)
+
+
+def read_sentences(path):
+    """Returns the sentences in a text file, one per line.
+
+    Blank lines and lines starting with # are skipped.
+    """
+    sentences = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                sentences.append(parse(line))
+    return sentences
+
+
+def write_sentences(path, sentences):
+    """Writes sentences to a text file, one per line."""
+    with open(path, "w", encoding="utf-8") as f:
+        for sentence in sentences:
+            f.write(serialize(sentence))
+            f.write("\n")
+
+
+# Binary format: MAGIC, the symbol table, the number of sentences, then the
+# sentences in postfix order as opcodes. SYMBOL is followed by a varint symbol
+# index and AND/OR by a varint number of operands.
+MAGIC = b"LKB1"
+SYMBOL, NOT, AND, OR, IMPLICATION, BICONDITIONAL = range(6)
+
+
+def _write_varint(buffer, n):
+    while n >= 0x80:
+        buffer.append(n & 0x7F | 0x80)
+        n >>= 7
+    buffer.append(n)
+
+
+def _read_varint(data, position):
+    n = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, position
+        shift += 7
+
+
+def dumps(sentences):
+    """Returns sentences encoded in the compact binary format."""
+    sentences = list(sentences)
+    symbols = {}  # Map from symbol name to index in the symbol table
+    code = bytearray()
+
+    for sentence in sentences:
+        pending = [(sentence, False)]
+        while pending:
+            item, expanded = pending.pop()
+            if isinstance(item, Symbol):
+                index = symbols.setdefault(item.name, len(symbols))
+                code.append(SYMBOL)
+                _write_varint(code, index)
+                continue
+            if isinstance(item, Not):
+                opcode, children = NOT, [item.operand]
+            elif isinstance(item, And):
+                opcode, children = AND, item.conjuncts
+            elif isinstance(item, Or):
+                opcode, children = OR, item.disjuncts
+            elif isinstance(item, Implication):
+                opcode, children = IMPLICATION, [item.antecedent,
+                                                 item.consequent]
+            elif isinstance(item, Biconditional):
+                opcode, children = BICONDITIONAL, [item.left, item.right]
+            else:
+                raise TypeError("must be a logical sentence")
+
+            # Emit the operator once all of its children have been emitted
+            if expanded:
+                code.append(opcode)
+                if opcode in (AND, OR):
+                    _write_varint(code, len(children))
+            else:
+                pending.append((item, True))
+                pending.extend((child, False) for child in reversed(children))
+
+    data = bytearray(MAGIC)
+    _write_varint(data, len(symbols))
+    for name in symbols:
+        encoded = name.encode("utf-8")
+        _write_varint(data, len(encoded))
+        data.extend(encoded)
+    _write_varint(data, len(sentences))
+    data.extend(code)
+    return bytes(data)
+
+
+def loads(data):
+    """Returns the list of sentences encoded by dumps."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a sentence file")
+    position = len(MAGIC)
+
+    count, position = _read_varint(data, position)
+    symbols = []
+    for _ in range(count):
+        length, position = _read_varint(data, position)
+        name = bytes(data[position:position + length]).decode("utf-8")
+        symbols.append(Symbol(name))
+        position += length
+    count, position = _read_varint(data, position)
+
+    stack = []
+    while position < len(data):
+        opcode = data[position]
+        position += 1
+        if opcode == SYMBOL:
+            index, position = _read_varint(data, position)
+            stack.append(symbols[index])
+        elif opcode == NOT:
+            stack.append(Not(stack.pop()))
+        elif opcode in (AND, OR):
+            arity, position = _read_varint(data, position)
+            children = stack[len(stack) - arity:]
+            del stack[len(stack) - arity:]
+            stack.append(And(*children) if opcode == AND else Or(*children))
+        elif opcode in (IMPLICATION, BICONDITIONAL):
+            right = stack.pop()
+            left = stack.pop()
+            if opcode == IMPLICATION:
+                stack.append(Implication(left, right))
+            else:
+                stack.append(Biconditional(left, right))
+        else:
+            raise ValueError(f"unknown opcode {opcode}")
+
+    if len(stack) != count:
+        raise ValueError("corrupt sentence file")
+    return stack
+
+
+def dump(sentences, path):
+    """Writes sentences to a file in the compact binary format."""
+    with open(path, "wb") as f:
+        f.write(dumps(sentences))
+
+
+def load(path):
+    """Returns the sentences in a file written by dump."""
+    with open(path, "rb") as f:
+        return loads(f.read())